@@ -1,12 +1,20 @@
-from fastapi import Depends,APIRouter
-from services.import_service import ingest_html
+from fastapi import Depends,APIRouter,Request
+from services.import_service import ingest_html, publish_index_generation, vectorstore_object
+from services.faq_service import ingest_faqs, faq_index_object
 from fastapi.security import APIKeyHeader
 api_key_header = APIKeyHeader(name="x_api_key",auto_error=False)
 from utilities.utills import verify_key
+from services.profiling import run_profiled
 
 router = APIRouter()
 
+def run_import():
+    documents = ingest_html()
+    ingest_faqs(documents)
+    # Let the other worker processes pick up the new index
+    publish_index_generation([vectorstore_object, faq_index_object.store])
+
 @router.get("/import",dependencies=[Depends(verify_key)])
-def import_data():
-    ingest_html()
+async def import_data(request: Request):
+    await run_profiled(request, run_import)
     return{"Message":f"You are ready to interact with chat"}
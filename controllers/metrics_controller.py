@@ -0,0 +1,9 @@
+from fastapi import Depends, APIRouter
+from services.metrics import metrics
+from utilities.utills import verify_key
+
+router = APIRouter()
+
+@router.get("/metrics", dependencies=[Depends(verify_key)])
+def get_metrics():
+    return metrics.snapshot()
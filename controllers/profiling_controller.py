@@ -0,0 +1,18 @@
+from fastapi import Depends, APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from services.profiling import profile_store
+from utilities.utills import verify_key
+
+router = APIRouter()
+
+@router.get("/admin/profiles", dependencies=[Depends(verify_key)])
+def list_profiles():
+    return {"profiles": profile_store.list()}
+
+# format=stats -> cProfile statistics, format=collapsed -> stacks for flamegraph.pl / speedscope
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(verify_key)])
+def get_profile(profile_id: str, format: str = Query("stats", pattern="^(stats|collapsed)$")):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.stats if format == "stats" else profile.collapsed)
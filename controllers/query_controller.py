@@ -1,21 +1,49 @@
-from fastapi import APIRouter, Query, UploadFile, File, Form
+from typing import List
+from fastapi import APIRouter, Depends, Query, Request, UploadFile, File, Form, WebSocket
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from services.query_service import chat_engine
+from services.batch_chat import batch_chat_runner
+from services.profiling import run_profiled
+from services.voice_service import VoiceSession
+from voice.backends import get_stt_backend, get_tts_backend
+from utilities.utills import verify_key
 from voice.stt import speech_to_text
 from voice.tts import text_to_speech
 import uuid
 import os
 router = APIRouter()
 
+# Pluggable speech backends for the streaming voice endpoint (VOICE_STT_BACKEND / VOICE_TTS_BACKEND)
+stt_backend = get_stt_backend()
+tts_backend = get_tts_backend()
+
 # Text based chat
 @router.post("/chat")
-async def chat_with_your_rag(user_query: str = Query(...),
+async def chat_with_your_rag(request: Request,
+                             user_query: str = Query(...),
                              session_id: str = Query(...),
                              user_id: str = Query(...)):
-    response = chat_engine.run_chat(user_query, session_id, user_id)
+    # Run in the threadpool so concurrent chats can overlap (and share embedding batches)
+    response = await run_profiled(request, chat_engine.run_chat, user_query, session_id, user_id)
     return {"Message": response}
 
+class BatchChatRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=1000)
+    session_id: str = "batch"
+    user_id: str = "helpdesk"
+
+# Bulk question answering, streamed back as NDJSON in completion order
+@router.post("/chat/batch", dependencies=[Depends(verify_key)])
+def chat_batch(request: BatchChatRequest):
+    return StreamingResponse(
+        batch_chat_runner.run_ndjson(request.questions, request.session_id, request.user_id),
+        media_type="application/x-ndjson"
+    )
+
 @router.post("/chat/audio")
 async def chat_with_audio(
+    request: Request,
     audio: UploadFile = File(...),
     session_id: str = Form(..., description="Session ID"),
     user_id: str = Form(..., description="User ID")
@@ -40,7 +68,7 @@ async def chat_with_audio(
             }
 
         # 2️⃣ Chat Response
-        response_text = chat_engine.run_chat(text_query, session_id, user_id)
+        response_text = await run_profiled(request, chat_engine.run_chat, text_query, session_id, user_id)
 
         # 3️⃣ Convert Text → Audio (TTS)
         output_audio_path = text_to_speech(response_text)
@@ -71,3 +99,12 @@ async def chat_with_audio(
             "message": f"Error processing audio: {str(e)}",
             "audio_url": ""
         }
+
+# Full-duplex voice chat: audio chunks in, partial transcripts, tokens and audio segments out
+@router.websocket("/chat/voice/ws")
+async def chat_with_voice_stream(websocket: WebSocket,
+                                 session_id: str = Query(...),
+                                 user_id: str = Query(...)):
+    await websocket.accept()
+    session = VoiceSession(websocket, session_id, user_id, stt_backend, tts_backend, chat_engine)
+    await session.run()
@@ -1,8 +1,15 @@
 // voice_script.js
+// Streams microphone audio to /api/chat/voice/ws and plays the answer sentence by sentence.
 
 const micBtn = document.getElementById("micBtn");
+const voiceChatWindow = document.getElementById("chat-window");
 let recorder;
-let chunks = [];
+let socket;
+let userBubble;
+let botBubble;
+let pendingAudio = null;   // metadata of the audio frame that follows
+let audioQueue = [];
+let playing = false;
 
 micBtn.addEventListener("click", async () => {
     if (micBtn.innerText === "🎤 Speak") {
@@ -12,45 +19,104 @@ micBtn.addEventListener("click", async () => {
     }
 });
 
-async function startRecording() {
-    try {
-        // Ask for microphone access
-        const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-        recorder = new MediaRecorder(stream);
-
-        chunks = [];
-        recorder.ondataavailable = (e) => chunks.push(e.data);
-
-        recorder.onstop = async () => {
-            const blob = new Blob(chunks, { type: "audio/webm" });
-            const formData = new FormData();
-            formData.append("audio", blob, "audio.webm");
+function addBubble(sender, text) {
+    const element = document.createElement("div");
+    element.classList.add("message", sender);
+    element.textContent = text;
+    voiceChatWindow.appendChild(element);
+    voiceChatWindow.scrollTop = voiceChatWindow.scrollHeight;
+    return element;
+}
 
-            // Updated URL with query params for session_id & user_id
-            const url = `http://127.0.0.1:8000/api/chat/audio?session_id=12345&user_id=ishrat`;
+function playNext() {
+    if (playing || audioQueue.length === 0) return;
+    playing = true;
+    const url = audioQueue.shift();
+    const audio = new Audio(url);
+    audio.onended = audio.onerror = () => {
+        URL.revokeObjectURL(url);
+        playing = false;
+        playNext();
+    };
+    audio.play().catch(() => audio.onended());
+}
 
-            try {
-                let res = await fetch(url, {
-                    method: "POST",s
-                    body: formData
-                });
+function openSocket() {
+    return new Promise((resolve, reject) => {
+        const sessionId = localStorage.getItem("sessionId") || "session_" + Date.now();
+        const userId = localStorage.getItem("userId") || "user_" + Date.now();
+        const protocol = window.location.protocol === "https:" ? "wss" : "ws";
+        const url = `${protocol}://${window.location.host}/api/chat/voice/ws` +
+            `?session_id=${encodeURIComponent(sessionId)}&user_id=${encodeURIComponent(userId)}`;
 
-                if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+        const ws = new WebSocket(url);
+        ws.binaryType = "blob";
+        ws.onopen = () => resolve(ws);
+        ws.onerror = (err) => reject(err);
+        ws.onclose = () => { socket = null; };
+        ws.onmessage = (event) => {
+            if (typeof event.data !== "string") {
+                // Binary frame: audio for the segment announced just before
+                if (pendingAudio) {
+                    const blob = new Blob([event.data], { type: pendingAudio.media_type });
+                    audioQueue.push(URL.createObjectURL(blob));
+                    pendingAudio = null;
+                    playNext();
+                }
+                return;
+            }
+            const data = JSON.parse(event.data);
+            if (data.type === "partial" || data.type === "transcript") {
+                if (!userBubble) userBubble = addBubble("user", "");
+                userBubble.textContent = data.text;
+            } else if (data.type === "token") {
+                if (!botBubble) botBubble = addBubble("bot", "");
+                botBubble.textContent += data.text;
+                voiceChatWindow.scrollTop = voiceChatWindow.scrollHeight;
+            } else if (data.type === "audio") {
+                pendingAudio = data;
+            } else if (data.type === "done") {
+                if (!botBubble) botBubble = addBubble("bot", "");
+                botBubble.innerHTML = marked.parse(data.message);
+                userBubble = null;
+                botBubble = null;
+            } else if (data.type === "error") {
+                addBubble("bot", data.message);
+                userBubble = null;
+                botBubble = null;
+            }
+        };
+    });
+}
 
-                const data = await res.json();
-                document.getElementById("bot").innerText = data.Message || "No response";
+async function startRecording() {
+    try {
+        // Ask for microphone access
+        const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+        if (!socket || socket.readyState !== WebSocket.OPEN) {
+            socket = await openSocket();
+        }
 
-            } catch (err) {
-                console.error("Bot Error:", err);
-                document.getElementById("bot").innerText = "Error contacting bot";
+        recorder = new MediaRecorder(stream);
+        userBubble = addBubble("user", "…");
+        recorder.ondataavailable = (e) => {
+            if (e.data.size > 0 && socket && socket.readyState === WebSocket.OPEN) {
+                socket.send(e.data);
+            }
+        };
+        recorder.onstop = () => {
+            stream.getTracks().forEach((track) => track.stop());
+            if (socket && socket.readyState === WebSocket.OPEN) {
+                socket.send(JSON.stringify({ type: "end" }));
             }
         };
 
-        recorder.start();
+        // Send a chunk every 250 ms while the user speaks
+        recorder.start(250);
         micBtn.innerText = "⏹ Stop";
     } catch (err) {
         console.error("Mic Error:", err);
-        alert("Microphone access denied or unavailable");
+        alert("Microphone or voice connection unavailable");
     }
 }
 
@@ -0,0 +1,22 @@
+# Multi-worker serving: gunicorn -c gunicorn.conf.py main:app
+# The app is imported once in the parent (preload_app) so the embedding model and
+# index snapshot are shared copy-on-write by all workers.
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    # Called in the parent after the app is loaded and before the first worker is forked
+    from services.preload import prepare_for_fork
+    prepare_for_fork()
+
+
+def post_fork(server, worker):
+    from services.preload import after_fork
+    after_fork()
@@ -32,8 +32,16 @@ templates = Jinja2Templates(directory="front_end/templates")
 
 from controllers.query_controller import router as chat
 from controllers.import_controller import  router as imp
+from controllers.metrics_controller import router as metrics
+from controllers.profiling_controller import router as profiling
 app.include_router(chat,prefix="/api")
 app.include_router(imp,prefix="/api")
+app.include_router(metrics,prefix="/api")
+app.include_router(profiling,prefix="/api")
+
+# On-demand (x-profile header + API key) and sampled request profiling
+from services.profiling import profiling_middleware
+app.middleware("http")(profiling_middleware)
 
 @app.get("/")
 async def read_root(request: Request):
@@ -0,0 +1,167 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from services.query_service import chat_engine, OVERLOAD_MESSAGE, LLM_UNAVAILABLE_MESSAGE
+
+load_dotenv()
+
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "4"))
+# Questions at least this similar (cosine) reuse the retrieved context of an earlier question
+BATCH_SHARED_RETRIEVAL_THRESHOLD = float(os.getenv("BATCH_SHARED_RETRIEVAL_THRESHOLD", "0.97"))
+
+logger = logging.getLogger(__name__)
+
+STATUS_BY_MESSAGE = {OVERLOAD_MESSAGE: "overloaded", LLM_UNAVAILABLE_MESSAGE: "unavailable"}
+
+
+class BatchChatRunner:
+    """
+    Answers a list of questions over the ChatEngine:
+    - all questions are embedded in one batched call,
+    - duplicate or near-duplicate questions share one retrieval,
+    - LLM calls run with bounded parallelism (the LLM governor still applies),
+    - results are yielded as soon as each answer finishes.
+    - retrieval is deferred until a question misses the FAQ fast path.
+    Each question gets its own session ("<session_id>:<run>:<index>", with a fresh run id) so
+    answers depend neither on each other nor on earlier runs, and no conversation context is kept.
+    """
+
+    def __init__(self, engine=chat_engine, max_parallel: int = BATCH_MAX_PARALLEL,
+                 similarity_threshold: float = BATCH_SHARED_RETRIEVAL_THRESHOLD):
+        if max_parallel <= 0:
+            raise ValueError("max_parallel must be positive.")
+        self.engine = engine
+        self.max_parallel = max_parallel
+        self.similarity_threshold = similarity_threshold
+
+    def _group_questions(self, questions: List[str], vectors: np.ndarray) -> List[int]:
+        """Map each question to the index of the representative question whose retrieval it reuses."""
+        normalized = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        seen_text, representatives, groups = {}, [], []
+        for i, question in enumerate(questions):
+            key = " ".join(question.lower().split())
+            if key in seen_text:
+                groups.append(seen_text[key])
+                continue
+            if representatives:
+                scores = normalized[representatives] @ normalized[i]
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    groups.append(representatives[best])
+                    seen_text[key] = representatives[best]
+                    continue
+            representatives.append(i)
+            seen_text[key] = i
+            groups.append(i)
+        return groups
+
+    def run(self, questions: List[str], session_id: str, user_id: str) -> Iterator[dict]:
+        if not questions:
+            return
+        started = time.perf_counter()
+        vectors = np.asarray(self.engine.embedder_object.model.embed_documents(questions), dtype=np.float32)
+        groups = self._group_questions(questions, vectors)
+
+        run_id = uuid.uuid4().hex[:12]
+        contexts, locks = {}, {rep: threading.Lock() for rep in set(groups)}
+
+        def context_for(rep: int) -> str:
+            # Retrieved once per group, by the first of its questions that needs it
+            with locks[rep]:
+                if rep not in contexts:
+                    contexts[rep] = self.engine.retrieve_context(questions[rep], query_vector=vectors[rep].tolist())
+                return contexts[rep]
+
+        def answer(index: int) -> dict:
+            item_started = time.perf_counter()
+            response = self.engine.run_chat(
+                questions[index], f"{session_id}:{run_id}:{index}", user_id,
+                context=lambda: context_for(groups[index]), remember_context=False
+            )
+            return {
+                "index": index,
+                "question": questions[index],
+                "answer": response,
+                "status": STATUS_BY_MESSAGE.get(response, "ok"),
+                "shared_retrieval_with": groups[index] if groups[index] != index else None,
+                "elapsed_ms": round((time.perf_counter() - item_started) * 1000, 1),
+            }
+
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="batch-chat")
+        try:
+            futures = {executor.submit(answer, i): i for i in range(len(questions))}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.error(f"Batch question {index} failed: {e}", exc_info=True)
+                    yield {"index": index, "question": questions[index], "status": "error", "error": str(e)}
+        except GeneratorExit:
+            # The consumer went away (e.g. the NDJSON client disconnected): drop the questions not started yet
+            logger.warning("Batch run %s abandoned; cancelling unanswered questions.", run_id)
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+        logger.info("Batch of %d questions needed %d retrievals and finished in %.1fs.",
+                    len(questions), len(contexts), time.perf_counter() - started)
+
+    def run_ndjson(self, questions: List[str], session_id: str, user_id: str) -> Iterator[str]:
+        for result in self.run(questions, session_id, user_id):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+# Global instance
+batch_chat_runner = BatchChatRunner()
+
+
+def _read_questions(path: str) -> List[str]:
+    if path == "-":
+        content = sys.stdin.read()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    try:
+        data = json.loads(content)
+        if isinstance(data, list):
+            return [str(q).strip() for q in data if str(q).strip()]
+    except json.JSONDecodeError:
+        pass
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a list of questions and write NDJSON results.")
+    parser.add_argument("questions", help="Text file with one question per line, a JSON list, or - for stdin.")
+    parser.add_argument("--out", help="Output NDJSON file (default: stdout).")
+    parser.add_argument("--parallel", type=int, default=BATCH_MAX_PARALLEL)
+    parser.add_argument("--session-id", default="batch")
+    parser.add_argument("--user-id", default="helpdesk")
+    args = parser.parse_args()
+
+    questions = _read_questions(args.questions)
+    runner = BatchChatRunner(max_parallel=args.parallel)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for line in runner.run_ndjson(questions, args.session_id, args.user_id):
+            out.write(line)
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+from langchain_core.embeddings import Embeddings
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingQuery:
+    __slots__ = ("text", "future", "enqueued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class EmbeddingBatcher:
+    """
+    Collects query texts submitted by concurrent requests and embeds them together.
+    - A batch is flushed when `window_ms` has passed since its first query
+      or when it reaches `max_batch_size`, whichever comes first.
+    - Each caller gets a Future resolved with its own vector (or the batch error).
+    - Records batch size and queue wait time in the shared metrics registry.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                 window_ms: float = 5.0, max_batch_size: int = 32):
+        if window_ms < 0 or max_batch_size <= 0:
+            raise ValueError("Invalid batching window or max batch size.")
+        self.embed_fn = embed_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[_PendingQuery]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        logger.info(f"EmbeddingBatcher initialized with window_ms={window_ms}, max_batch_size={max_batch_size}")
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def after_fork(self):
+        """The worker thread and any queued work belong to the parent; start clean in the child."""
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        pending = _PendingQuery(text)
+        self._queue.put(pending)
+        return pending.future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def _collect_batch(self) -> List[_PendingQuery]:
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.monotonic()
+            metrics.observe("embedding.batch_size", len(batch))
+            for pending in batch:
+                metrics.observe("embedding.queue_wait_ms", (started - pending.enqueued_at) * 1000)
+
+            try:
+                vectors = self.embed_fn([pending.text for pending in batch])
+            except Exception as e:
+                logger.error(f"Batched embedding of {len(batch)} queries failed: {e}", exc_info=True)
+                for pending in batch:
+                    pending.future.set_exception(e)
+                continue
+
+            metrics.observe("embedding.batch_latency_ms", (time.monotonic() - started) * 1000)
+            for pending, vector in zip(batch, vectors):
+                pending.future.set_result(vector)
+
+
+class BatchedQueryEmbeddings(Embeddings):
+    """
+    Embeddings adapter handed to the vector store.
+    Queries go through the shared EmbeddingBatcher; documents (ingestion) are
+    already batched by the caller and go straight to the underlying model.
+    """
+
+    def __init__(self, model: Embeddings, batcher: EmbeddingBatcher):
+        self.model = model
+        self.batcher = batcher
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.embed(text)
@@ -0,0 +1,135 @@
+import logging
+import math
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+# Short domain sentences used to compare a backend against the reference PyTorch model
+CONSISTENCY_SAMPLE_TEXTS = [
+    "How do I register for the Four-Year Undergraduate Programme?",
+    "What is the fee structure for B.Sc. Computer Science?",
+    "Admission notice for PG courses and eligibility criteria.",
+    "The academic calendar lists examination dates and holidays.",
+]
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def check_consistency(candidate: Embeddings, reference: Embeddings,
+                      texts: List[str] = CONSISTENCY_SAMPLE_TEXTS, tolerance: float = 0.01) -> float:
+    """
+    Embed `texts` with both models and require cosine similarity >= 1 - tolerance for every pair.
+    Returns the smallest similarity seen; raises RuntimeError when the tolerance is exceeded.
+    """
+    candidate_vectors = candidate.embed_documents(texts)
+    reference_vectors = reference.embed_documents(texts)
+    worst = min(_cosine(c, r) for c, r in zip(candidate_vectors, reference_vectors))
+    if worst < 1 - tolerance:
+        raise RuntimeError(f"Embedding backend deviates from reference: min cosine {worst:.4f} < {1 - tolerance:.4f}")
+    logger.info(f"Embedding backend consistent with reference: min cosine {worst:.4f}")
+    return worst
+
+
+def set_torch_threads(num_threads: int):
+    if num_threads <= 0:
+        return
+    import torch
+    torch.set_num_threads(num_threads)
+    logger.info(f"PyTorch intra-op threads set to {num_threads}")
+
+
+def _onnx_session_options(num_threads: int):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads > 0:
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+    return options
+
+
+def _quantized_file_suffix(quantization_config: str) -> str:
+    # Passed explicitly to the exporter: its default suffix depends on the config's weight dtype
+    return f"quantized_{quantization_config}"
+
+
+def _onnx_location(model_name: str, export_dir: str, quantize: bool, quantization_config: str) -> Tuple[Path, str]:
+    target = Path(export_dir) / model_name.replace("/", "__")
+    if quantize:
+        return target, f"onnx/model_{_quantized_file_suffix(quantization_config)}.onnx"
+    return target, "onnx/model.onnx"
+
+
+def export_onnx_model(model_name: str, export_dir: str, quantize: bool = False,
+                      quantization_config: str = "avx2") -> Tuple[Path, str]:
+    """
+    Export `model_name` to ONNX under `export_dir` (once) and optionally add a
+    dynamically int8-quantised variant. Returns the model directory and the ONNX file name to load.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    target, file_name = _onnx_location(model_name, export_dir, quantize, quantization_config)
+    if (target / file_name).exists():
+        return target, file_name
+
+    logger.info(f"Exporting {model_name} to ONNX at {target}")
+    model = SentenceTransformer(model_name, backend="onnx", model_kwargs={"provider": "CPUExecutionProvider"})
+    model.save_pretrained(str(target))
+    if quantize:
+        export_dynamic_quantized_onnx_model(model, quantization_config, str(target),
+                                            file_suffix=_quantized_file_suffix(quantization_config))
+
+    if not (target / file_name).exists():
+        raise FileNotFoundError(f"ONNX export did not produce {target / file_name}")
+    return target, file_name
+
+
+def build_embeddings(model_name: str, backend: str = "torch", num_threads: int = 0,
+                     onnx_dir: str = "./onnx_models", quantize: bool = False,
+                     quantization_config: str = "avx2", check: bool = False,
+                     tolerance: float = 0.01) -> HuggingFaceEmbeddings:
+    """
+    Load the sentence-transformers model with the selected CPU inference backend.
+    - torch: default PyTorch runtime (reference), optionally with a fixed thread count.
+    - onnx: exported ONNX model run with ONNX Runtime, optionally int8-quantised.
+    A freshly exported ONNX model is always checked against the reference; set `check`
+    to repeat the check on every load.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+
+    if backend == "torch":
+        set_torch_threads(num_threads)
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    target, file_name = _onnx_location(model_name, onnx_dir, quantize, quantization_config)
+    freshly_exported = not (target / file_name).exists()
+    model_path, file_name = export_onnx_model(model_name, onnx_dir, quantize, quantization_config)
+    model = HuggingFaceEmbeddings(
+        model_name=str(model_path),
+        model_kwargs={
+            "backend": "onnx",
+            "model_kwargs": {
+                "file_name": file_name,
+                "provider": "CPUExecutionProvider",
+                "session_options": _onnx_session_options(num_threads),
+            },
+        },
+    )
+    logger.info(f"ONNX Runtime embedding backend loaded: {model_path / file_name}")
+
+    if check or freshly_exported:
+        set_torch_threads(num_threads)
+        check_consistency(model, HuggingFaceEmbeddings(model_name=model_name), tolerance=tolerance)
+    return model
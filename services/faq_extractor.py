@@ -0,0 +1,74 @@
+import logging
+import os
+import re
+from typing import List
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+load_dotenv()
+
+FAQ_SOURCE_PATTERN = os.getenv("FAQ_SOURCE_PATTERN", "faq")  # regex matched against the file name
+
+logger = logging.getLogger(__name__)
+
+
+class FaqExtractor:
+    """
+    Extracts question/answer pairs from FAQ documents.
+    Recognises markers such as "Q-1:", "Q.", "Question 3:" and "A-1:", "Ans:", "Answer:".
+    When an answer marker is missing, text after a question ending in "?" is taken as the answer.
+    Pages of the same source are joined so pairs may span page breaks.
+    """
+
+    QUESTION_RE = re.compile(r"^\s*Q(?:uestion)?\s*[-.]?\s*\d*\s*[:.)-]\s*(.*)$", re.IGNORECASE)
+    # "Ans"/"Answer" in any case, or a capital "A" followed by a number or ":" ("A-1:", "A1.", "A:");
+    # lettered list items inside answers ("a) ...", "A) ...") are not answer markers
+    ANSWER_RE = re.compile(r"^\s*(?:(?i:ans(?:wer)?)\s*[-.]?\s*\d*\s*[:.)-]|A\s*[-.]?\s*\d+\s*[:.)-]|A\s*:)\s*(.*)$")
+
+    def __init__(self, source_pattern: str = FAQ_SOURCE_PATTERN):
+        self.source_pattern = re.compile(source_pattern, re.IGNORECASE)
+
+    def _pairs_from_text(self, text: str) -> List[tuple]:
+        pairs = []
+        question, answer, state = [], [], None
+
+        def flush():
+            q, a = " ".join(question).strip(), " ".join(answer).strip()
+            if q and a:
+                pairs.append((q, a))
+
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            q_match = self.QUESTION_RE.match(line)
+            a_match = self.ANSWER_RE.match(line)
+            if q_match:
+                flush()
+                question, answer, state = [q_match.group(1)], [], "question"
+            elif a_match and state == "question":
+                answer, state = [a_match.group(1)], "answer"
+            elif state == "question":
+                if question and question[-1].endswith("?"):
+                    answer, state = [line], "answer"
+                else:
+                    question.append(line)
+            elif state == "answer":
+                answer.append(line)
+        flush()
+        return pairs
+
+    def extract(self, documents: List[Document]) -> List[Document]:
+        texts_by_source = {}
+        for doc in documents:
+            source = str(doc.metadata.get("source", ""))
+            if self.source_pattern.search(os.path.basename(source)):
+                texts_by_source.setdefault(source, []).append(doc.page_content)
+
+        faq_docs = []
+        for source, pages in texts_by_source.items():
+            for question, answer in self._pairs_from_text("\n".join(pages)):
+                faq_docs.append(Document(page_content=question, metadata={"answer": answer, "source": source}))
+        logger.info(f"Extracted {len(faq_docs)} FAQ pairs from {len(texts_by_source)} FAQ files.")
+        return faq_docs
@@ -0,0 +1,106 @@
+import logging
+import os
+import re
+import uuid
+from collections import namedtuple
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from services.faq_extractor import FaqExtractor
+from services.import_service import VectorStoreManager, embedder_object
+
+load_dotenv()
+
+FAQ_FASTPATH = os.getenv("FAQ_FASTPATH", "true").lower() == "true"
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.9"))  # cosine similarity
+
+logger = logging.getLogger(__name__)
+
+FaqMatch = namedtuple("FaqMatch", ["question", "answer", "score"])
+
+# Words that only make sense with the previous turn in mind ("what about its fee?")
+FOLLOW_UP_WORDS = {
+    "it", "its", "that", "this", "those", "these", "they", "them", "their",
+    "he", "she", "his", "her", "same", "above", "else", "also", "more",
+}
+FOLLOW_UP_PREFIXES = ("and ", "what about", "how about", "also ", "then ", "so ")
+
+
+def is_follow_up(query: str, history: list) -> bool:
+    """Heuristic: a query that depends on earlier turns should go through the LLM with history."""
+    if not history:
+        return False
+    text = query.strip().lower()
+    words = re.findall(r"[a-z']+", text)
+    if len(words) <= 3:
+        return True
+    if text.startswith(FOLLOW_UP_PREFIXES):
+        return True
+    return any(word in FOLLOW_UP_WORDS for word in words)
+
+
+class FaqIndex:
+    """
+    Dedicated question index persisted in its own Chroma collection.
+    Question vectors are also kept normalised in memory so matching is a single
+    matrix-vector product with a real cosine-similarity threshold.
+    """
+
+    def __init__(self, embedder=embedder_object, collection_name: str = "faq_collection",
+                 threshold: float = FAQ_MATCH_THRESHOLD):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.store = VectorStoreManager(
+            embedding_function=embedder.query_model,
+            collection_name=collection_name,
+            quantization="none"
+        )
+        # (questions, answers, normalised vectors), swapped as one tuple on reload
+        self._entries = ([], [], None)
+        self._load()
+
+    def _load(self):
+        records = self.store.vectorstore.get(include=["embeddings", "documents", "metadatas"])
+        questions = list(records["documents"])
+        answers = [(metadata or {}).get("answer", "") for metadata in records["metadatas"]]
+        vectors = None
+        if questions:
+            vectors = np.asarray(records["embeddings"], dtype=np.float32)
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self._entries = (questions, answers, vectors)
+        logger.info(f"FAQ index loaded with {len(questions)} questions.")
+
+    def rebuild(self, faq_docs: List[Document]):
+        self.store.reset()
+        if faq_docs:
+            self.store.add_embedding_record([{"id": str(uuid.uuid4()), "document": doc} for doc in faq_docs])
+        self._load()
+
+    def match(self, query: str) -> Optional[FaqMatch]:
+        if self.store.refresh_if_stale():
+            self._load()
+        questions, answers, vectors = self._entries
+        if vectors is None:
+            return None
+        query_vector = np.asarray(self.embedder.embed_query(query), dtype=np.float32)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+        scores = vectors @ query_vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return FaqMatch(questions[best], answers[best], float(scores[best]))
+
+
+# Instantiate objects
+faq_extractor_object = FaqExtractor()
+faq_index_object = FaqIndex()
+
+
+def ingest_faqs(documents: List[Document]):
+    faq_docs = faq_extractor_object.extract(documents)
+    faq_index_object.rebuild(faq_docs)
+    logger.info("FAQ index rebuilt with %d questions.", len(faq_docs))
+    return faq_docs
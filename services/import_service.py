@@ -3,8 +3,10 @@ import os
 import json
 import csv
 import uuid
+import time
+import threading
 from pathlib import Path
-from typing import List, Optional, Dict,Callable, Any
+from typing import List, Optional, Dict,Callable, Any, Tuple
 
 from dotenv import load_dotenv
 from langchain_community.document_loaders import (
@@ -15,14 +17,45 @@ from langchain_community.document_loaders import (
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
+from chromadb.api.client import SharedSystemClient
 import pdfplumber
+
+from services.embedding_batcher import EmbeddingBatcher, BatchedQueryEmbeddings
+from services.quantized_index import QuantizedIndex, rescore
+from services.embedding_runtime import build_embeddings, set_torch_threads
+from services.index_generation import read_generation, bump_generation
+from services.neighbourhood_index import NeighbourhoodIndex, parent_id_for
 load_dotenv()
 
 EMBEDDING_MODEL_NAME = os.getenv("MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
 folder_path = os.getenv("DATA_FOLDER_PATH", "./data")  # fallback to ./data if not set
 
+# Chunking defaults (see `python -m services.retrieval_tuning` to choose them from data)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+
+# CPU inference backend for the embedding model: "torch" or "onnx"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))  # 0 = runtime default
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "./onnx_models")
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "false").lower() == "true"
+EMBEDDING_ONNX_QUANTIZATION_CONFIG = os.getenv("EMBEDDING_ONNX_QUANTIZATION_CONFIG", "avx2")
+EMBEDDING_CONSISTENCY_CHECK = os.getenv("EMBEDDING_CONSISTENCY_CHECK", "false").lower() == "true"
+EMBEDDING_CONSISTENCY_TOLERANCE = float(os.getenv("EMBEDDING_CONSISTENCY_TOLERANCE", "0.01"))
+
+# Query embedding micro-batching across concurrent requests
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "true").lower() == "true"
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+
+# Quantized first-pass search: "none", "int8" or "binary"
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+QUANTIZED_RESCORE_FACTOR = int(os.getenv("QUANTIZED_RESCORE_FACTOR", "4"))
+
+# How often workers check whether ingestion published a new index generation
+INDEX_REFRESH_INTERVAL_S = float(os.getenv("INDEX_REFRESH_INTERVAL_S", "5"))
+
 # Configure logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -198,7 +231,7 @@ class Chunker:
     - Filters out empty chunks to ensure embedding success.
     """
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
         if chunk_size <= 0 or chunk_overlap < 0 or chunk_overlap >= chunk_size:
             raise ValueError("Invalid chunk size or overlap.")
         self.chunk_size = chunk_size
@@ -207,7 +240,8 @@ class Chunker:
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
-            is_separator_regex=False
+            is_separator_regex=False,
+            add_start_index=True
         )
         logger.info(f"Chunker initialized with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
 
@@ -222,14 +256,22 @@ class Chunker:
             return []
 
     def split_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        Each chunk records its parent (page / row / file) and its ordinal position within it,
+        which the neighbourhood index uses to expand hits to surrounding text.
+        """
         all_chunks = []
         for doc in documents:
             if doc.metadata.get("row") is not None:
                 # Already chunked row from CSV
                 if doc.page_content.strip():
+                    doc.metadata.update(parent_id=parent_id_for(doc.metadata), chunk_index=0, start_index=0)
                     all_chunks.append(doc)
             else:
                 chunks = self.split_text_with_metadata(doc.page_content, doc.metadata)
+                parent_id = parent_id_for(doc.metadata)
+                for ordinal, chunk in enumerate(chunks):
+                    chunk.metadata.update(parent_id=parent_id, chunk_index=ordinal)
                 all_chunks.extend(chunks)
         logger.info(f"Split {len(documents)} docs into {len(all_chunks)} chunks.")
         return all_chunks
@@ -245,14 +287,58 @@ class Chunker:
         return clean_docs
 
 class Embedder:
-    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, batching: bool = EMBED_BATCHING,
+                 backend: str = EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self.model = self._load_model(check=EMBEDDING_CONSISTENCY_CHECK)
+
+        # Queries from concurrent requests share batched forward passes
+        self.query_batcher = None
+        self.query_model = self.model
+        if batching:
+            self.query_batcher = EmbeddingBatcher(
+                lambda texts: self.model.embed_documents(texts),
+                window_ms=EMBED_BATCH_WINDOW_MS,
+                max_batch_size=EMBED_BATCH_MAX_SIZE
+            )
+            self.query_model = BatchedQueryEmbeddings(self.model, self.query_batcher)
+
+    def _load_model(self, check: bool) -> Embeddings:
         try:
-            self.model = HuggingFaceEmbeddings(model_name=model_name)
-            logger.info(f"Embedding model initialized: {model_name}")
+            model = build_embeddings(
+                self.model_name,
+                backend=self.backend,
+                num_threads=EMBEDDING_NUM_THREADS,
+                onnx_dir=EMBEDDING_ONNX_DIR,
+                quantize=EMBEDDING_ONNX_QUANTIZE,
+                quantization_config=EMBEDDING_ONNX_QUANTIZATION_CONFIG,
+                check=check,
+                tolerance=EMBEDDING_CONSISTENCY_TOLERANCE
+            )
+            logger.info(f"Embedding model initialized: {self.model_name} ({self.backend} backend)")
+            return model
         except Exception as e:
             logger.critical(f"Embedding model initialization failed: {e}", exc_info=True)
             raise
 
+    def after_fork(self):
+        """
+        Re-create per-process runtime state in a forked worker.
+        PyTorch weights stay shared with the parent; ONNX Runtime sessions own
+        thread pools that do not survive fork, so the ONNX model is reloaded.
+        """
+        if self.backend == "onnx":
+            self.model = self._load_model(check=False)
+            if self.query_batcher is not None:
+                self.query_model.model = self.model
+            else:
+                self.query_model = self.model
+        else:
+            set_torch_threads(EMBEDDING_NUM_THREADS)
+        if self.query_batcher is not None:
+            self.query_batcher.after_fork()
+
     def embed_documents(self, docs: List[Document]) -> List[Dict[str, Any]]:
         for i, doc in enumerate(docs):
             logger.info(f"Document {i} metadata:", doc.metadata)                                                                                      
@@ -270,40 +356,182 @@ class Embedder:
     def embed_query(self, query: str) -> List[float]:
         if not isinstance(query, str):
             raise ValueError("Query must be a string.")
-        return self.model.embed_query(query)
+        return self.query_model.embed_query(query)
 
 
 class VectorStoreManager:
-    def __init__(self, embedding_function: Embeddings, collection_name: str = "rag_collection"):
+    def __init__(self, embedding_function: Embeddings, collection_name: str = "rag_collection",
+                 quantization: str = VECTOR_QUANTIZATION, rescore_factor: int = QUANTIZED_RESCORE_FACTOR):
         self.persist_directory = os.getenv("CHROMA_DB_PATH", "vectorstore/chroma_db")
         self.collection_name = collection_name
         self.embedding_function = embedding_function
-        self.vectorstore = None
-        self._initialize_vectorstore()
-
-    def _initialize_vectorstore(self):
-        self.vectorstore = Chroma(
+        self.rescore_factor = rescore_factor
+        self.quantization = quantization
+        # (pid, Chroma client, its chromadb System, quantized index): always replaced as a
+        # whole, so readers never pair a reopened client with a stale index
+        self._snapshot = (None, None, None, None)
+        self._refresh_lock = threading.Lock()
+        self.generation = read_generation(self.persist_directory)
+        self._generation_checked_at = time.monotonic()
+        store, system = self._open_client()
+        self._snapshot = (os.getpid(), store, system, self._build_quantized_index(store))
+
+    def _current(self) -> Tuple[Chroma, Optional[QuantizedIndex]]:
+        """
+        The client and quantized index of the current snapshot.
+        Chroma clients are not fork-safe: a worker process opens its own on first use,
+        while the quantized index built in the parent stays shared copy-on-write.
+        """
+        pid, store, _, index = self._snapshot
+        if store is None or pid != os.getpid():
+            with self._refresh_lock:
+                pid, store, system, index = self._snapshot
+                if store is None or pid != os.getpid():
+                    store, system = self._open_client()
+                    self._snapshot = (os.getpid(), store, system, index)
+        return store, index
+
+    @property
+    def vectorstore(self) -> Chroma:
+        return self._current()[0]
+
+    @property
+    def quantized_index(self) -> Optional[QuantizedIndex]:
+        return self._current()[1]
+
+    def _open_client(self) -> Tuple[Chroma, Any]:
+        store = Chroma(
             collection_name=self.collection_name,
             embedding_function=self.embedding_function,
             persist_directory=self.persist_directory
         )
+        identifier = getattr(store._client, "_identifier", None)
+        return store, SharedSystemClient._identifier_to_system.get(identifier)
+
+    @staticmethod
+    def _evict_system(store: Optional[Chroma], system: Any) -> bool:
+        """
+        Remove `system` from chromadb's process-wide cache (keyed by persist path), so the
+        next client opens a fresh System instead of reusing it. Clients already holding it
+        keep working. Returns True when this call evicted it.
+        """
+        if store is None or system is None:
+            return False
+        identifier = getattr(store._client, "_identifier", None)
+        cache = SharedSystemClient._identifier_to_system
+        if cache.get(identifier) is not system:
+            return False
+        cache.pop(identifier, None)
+        return True
+
+    def release_client(self):
+        """
+        Close this process's Chroma client and stop its chromadb System (SQLite and Rust
+        runtime state). Only safe when no search can be running, i.e. in the parent right
+        before forking workers; every worker then opens a new System of its own.
+        """
+        with self._refresh_lock:
+            _, store, system, index = self._snapshot
+            self._snapshot = (None, None, None, index)
+            if self._evict_system(store, system):
+                system.stop()
+
+    def _build_quantized_index(self, store: Chroma) -> Optional[QuantizedIndex]:
+        if self.quantization == "none":
+            return None
+        records = store.get(include=["embeddings"])
+        index = QuantizedIndex(self.quantization)
+        index.build(records["ids"], records["embeddings"])
+        return index
+
+    def _swap_index(self, store: Chroma):
+        # Build a new index and swap it in, so concurrent searches never see a half-built one
+        index = self._build_quantized_index(store)
+        with self._refresh_lock:
+            pid, current, system, _ = self._snapshot
+            self._snapshot = (pid, current, system, index)
+
+    def refresh_if_stale(self) -> bool:
+        """
+        Reopen the collection when ingestion (possibly in another worker) published a new
+        index generation. Checked at most every INDEX_REFRESH_INTERVAL_S seconds.
+        Returns True when a refresh happened.
+        """
+        now = time.monotonic()
+        if now - self._generation_checked_at < INDEX_REFRESH_INTERVAL_S:
+            return False
+        with self._refresh_lock:
+            self._generation_checked_at = now
+            generation = read_generation(self.persist_directory)
+            if generation == self.generation:
+                return False
+            logger.info(f"Index generation {self.generation} -> {generation}; reloading '{self.collection_name}'.")
+            # The cached System keeps serving the old on-disk state. Evict (not stop) it:
+            # in-flight searches and other managers on the same path may still be using it,
+            # and it is released once the last client referencing it is gone.
+            _, store, system, _ = self._snapshot
+            self._evict_system(store, system)
+            store, system = self._open_client()
+            self._snapshot = (os.getpid(), store, system, self._build_quantized_index(store))
+            self.generation = generation
+            return True
+
+    def reset(self):
+        """Drop every record in the collection (used for derived indexes that are rebuilt from scratch)."""
+        self.vectorstore.delete_collection()
+        with self._refresh_lock:
+            store, system = self._open_client()
+            self._snapshot = (os.getpid(), store, system, self._build_quantized_index(store))
 
     def add_embedding_record(self, embed_records: List[Dict]):
         docs = [record["document"] for record in embed_records]
         ids = [record["id"] for record in embed_records]
-        self.vectorstore.add_documents(documents=docs, ids=ids)
+        store = self.vectorstore
+        store.add_documents(documents=docs, ids=ids)
+        self._swap_index(store)
+
+    def _quantized_search(self, store: Chroma, index: QuantizedIndex,
+                          query_vector: List[float], k: int) -> List[Document]:
+        """
+        First pass over the compact quantized index, then rescore the top
+        k * rescore_factor candidates against their full-precision vectors.
+        """
+        candidate_ids = index.search(query_vector, k * self.rescore_factor)
+        if not candidate_ids:
+            return []
+
+        records = store.get(ids=candidate_ids, include=["embeddings", "documents", "metadatas"])
+        top = rescore(query_vector, records["ids"], records["embeddings"], k)
+        return [
+            Document(page_content=records["documents"][i], metadata=records["metadatas"][i] or {})
+            for i in top
+        ]
 
     def similarity_search(self, query: str, k: int = 5) -> List[Document]:
-        if not self.vectorstore:
+        self.refresh_if_stale()
+        store, index = self._current()
+        if not store:
             raise RuntimeError("Vectorstore not initialized.")
-        return self.vectorstore.similarity_search(query, k=k)
+        if index is not None and len(index):
+            return self._quantized_search(store, index, self.embedding_function.embed_query(query), k)
+        return store.similarity_search(query, k=k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 5) -> List[Document]:
+        self.refresh_if_stale()
+        store, index = self._current()
+        if not store:
+            raise RuntimeError("Vectorstore not initialized.")
+        if index is not None and len(index):
+            return self._quantized_search(store, index, embedding, k)
+        return store.similarity_search_by_vector(embedding, k=k)
 
 
 # Instantiate objects
 document_loader_object = UniversalFileLoader(folder_path)
 chunker_object = Chunker()
 embedder_object = Embedder()
-vectorstore_object = VectorStoreManager(embedding_function=embedder_object.model)
+vectorstore_object = VectorStoreManager(embedding_function=embedder_object.query_model)
+neighbourhood_index_object = NeighbourhoodIndex(vectorstore_object.persist_directory, vectorstore_object.collection_name)
 
 
 def ingest_html():
@@ -318,3 +546,15 @@ def ingest_html():
 
     vectorstore_object.add_embedding_record(embedder_value)
     logger.info("Successfully embedded and added %d chunks to the vector store.", len(final_chunks_with_metadata))
+
+    neighbourhood_index_object.update(documents, final_chunks_with_metadata)
+    return documents
+
+
+def publish_index_generation(managers: List[VectorStoreManager]) -> int:
+    """Announce a finished ingestion so other worker processes reload their index."""
+    generation = bump_generation(vectorstore_object.persist_directory)
+    for manager in managers:
+        manager.generation = generation
+    logger.info("Published index generation %d.", generation)
+    return generation
@@ -0,0 +1,26 @@
+import os
+from pathlib import Path
+
+GENERATION_FILE = "index_generation"
+
+
+def read_generation(persist_directory: str) -> int:
+    """Current index generation published in `persist_directory` (0 if never published)."""
+    try:
+        return int((Path(persist_directory) / GENERATION_FILE).read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_generation(persist_directory: str) -> int:
+    """
+    Publish a new index generation after ingestion. The file is replaced atomically,
+    so workers polling it never read a partial value.
+    """
+    directory = Path(persist_directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    generation = read_generation(persist_directory) + 1
+    tmp_path = directory / f".{GENERATION_FILE}.{os.getpid()}"
+    tmp_path.write_text(str(generation))
+    os.replace(tmp_path, directory / GENERATION_FILE)
+    return generation
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+_STREAM_END = object()
+
+
+class LLMOverloadedError(RuntimeError):
+    """Raised when the LLM wait queue is full (or a queued call waited too long for a slot)."""
+
+
+def prompt_fingerprint(inputs: Dict[str, Any]) -> str:
+    """
+    Stable hash of everything that ends up in the prompt.
+    Chat history entries may be Message rows or plain values.
+    """
+    history = [
+        (getattr(m, "role", None), getattr(m, "message", str(m)))
+        for m in inputs.get("chat_history", [])
+    ]
+    payload = {
+        "question": inputs.get("question"),
+        "context": inputs.get("context"),
+        "prev_context": inputs.get("prev_context"),
+        "chat_history": history,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LLMGovernor:
+    """
+    Guards the LLM stage:
+    - single-flight: concurrent calls with the same fingerprint share one upstream call,
+    - at most `max_concurrency` upstream calls, with up to `max_queue` callers waiting for a slot,
+    - a deadline per attempt and jittered exponential backoff between retries.
+    Streamed calls (`stream`) share the slots, deadline and retry policy but are not coalesced.
+    A slot stays taken until the upstream call really finishes, even after its deadline passed,
+    so timed-out calls still count against the upstream rate limit.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32, timeout: float = 30.0,
+                 max_retries: int = 2, backoff: float = 0.5, max_backoff: float = 8.0):
+        if max_concurrency <= 0 or max_queue < 0 or timeout <= 0 or max_retries < 0:
+            raise ValueError("Invalid LLM governor limits.")
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-call")
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._inflight: Dict[str, Future] = {}
+        logger.info(f"LLMGovernor initialized with max_concurrency={max_concurrency}, "
+                    f"max_queue={max_queue}, timeout={timeout}s, max_retries={max_retries}")
+
+    def _acquire_slot(self):
+        if self._slots.acquire(blocking=False):
+            return
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                metrics.increment("llm.rejected")
+                raise LLMOverloadedError("LLM queue is full.")
+            self._waiting += 1
+        started = time.monotonic()
+        try:
+            if not self._slots.acquire(timeout=self.timeout):
+                metrics.increment("llm.rejected")
+                raise LLMOverloadedError("Timed out waiting for an LLM slot.")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+            metrics.observe("llm.queue_wait_ms", (time.monotonic() - started) * 1000)
+
+    def _attempt(self, fn: Callable[[], Any]) -> Any:
+        self._acquire_slot()
+        try:
+            future = self._executor.submit(fn)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            metrics.increment("llm.timeouts")
+            raise TimeoutError(f"LLM call exceeded {self.timeout}s deadline.")
+
+    def _call_with_retries(self, fn: Callable[[], Any]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                result = self._attempt(fn)
+                metrics.observe("llm.latency_ms", (time.monotonic() - started) * 1000)
+                return result
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                if attempt == self.max_retries:
+                    metrics.increment("llm.failures")
+                    raise
+                self._backoff(attempt, e)
+
+    def _backoff(self, attempt: int, error: Exception):
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.0)
+        metrics.increment("llm.retries")
+        logger.warning(f"LLM call failed (attempt {attempt + 1}): {error}; retrying in {delay:.2f}s")
+        time.sleep(delay)
+
+    def _stream_attempt(self, fn: Callable[[], Iterable[Any]]) -> Iterator[Any]:
+        """
+        Pull chunks on the call executor so the deadline covers the whole stream.
+        The slot is released once the last pull really finishes.
+        """
+        self._acquire_slot()
+        deadline = time.monotonic() + self.timeout
+        pending = None
+        try:
+            chunks = iter(fn())
+            while True:
+                pending = self._executor.submit(next, chunks, _STREAM_END)
+                try:
+                    chunk = pending.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    metrics.increment("llm.timeouts")
+                    raise TimeoutError(f"LLM stream exceeded {self.timeout}s deadline.")
+                if chunk is _STREAM_END:
+                    return
+                yield chunk
+        finally:
+            if pending is None:
+                self._slots.release()
+            else:
+                pending.add_done_callback(lambda _: self._slots.release())
+
+    def stream(self, fn: Callable[[], Iterable[Any]]) -> Iterator[Any]:
+        """
+        Streaming counterpart of `invoke`, without single-flight. A failed attempt is
+        retried only while no chunk has been yielded yet.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            yielded = False
+            try:
+                for chunk in self._stream_attempt(fn):
+                    yielded = True
+                    yield chunk
+                metrics.observe("llm.latency_ms", (time.monotonic() - started) * 1000)
+                return
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                if yielded or attempt == self.max_retries:
+                    metrics.increment("llm.failures")
+                    raise
+                self._backoff(attempt, e)
+
+    def invoke(self, fingerprint: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            shared = self._inflight.get(fingerprint)
+            leader = shared is None
+            if leader:
+                shared = Future()
+                self._inflight[fingerprint] = shared
+
+        if not leader:
+            metrics.increment("llm.coalesced")
+            logger.info("Coalesced LLM call with in-flight request %s", fingerprint[:12])
+            return shared.result()
+
+        try:
+            result = self._call_with_retries(fn)
+            shared.set_result(result)
+            return result
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(fingerprint, None)
@@ -0,0 +1,43 @@
+import threading
+from typing import Dict, Any
+
+
+class Metrics:
+    """
+    Small in-process metrics registry.
+    - Counters are monotonically increasing integers.
+    - Summaries keep count/sum/min/max of observed values (e.g. batch sizes, latencies).
+    Thread-safe so it can be updated from the threadpool and background workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._summaries: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = {"count": 1, "sum": value, "min": value, "max": value}
+                return
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            summaries = {
+                name: {**values, "avg": values["sum"] / values["count"]}
+                for name, values in self._summaries.items()
+            }
+            return {"counters": dict(self._counters), "summaries": summaries}
+
+
+# Global instance
+metrics = Metrics()
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+
+def parent_id_for(metadata: Dict) -> str:
+    """Parent section of a chunk: the page (PDFs), the row (CSVs) or else the whole source file."""
+    source = str(metadata.get("source", ""))
+    if metadata.get("page") is not None:
+        return f"{source}#page={metadata['page']}"
+    if metadata.get("row") is not None:
+        return f"{source}#row={metadata['row']}"
+    return source
+
+
+class NeighbourhoodIndex:
+    """
+    Precomputed chunk neighbourhoods for small-to-big retrieval.
+    For every parent (page / section) it keeps the parent text and the character span of each
+    chunk in order, so a hit on chunk i can be widened to chunks i-1, i+1, ... by slicing the
+    parent text (no duplicated overlap, no extra vector store queries).
+    Persisted as JSON next to the Chroma files and reloaded when a new index generation appears.
+    """
+
+    def __init__(self, persist_directory: str, collection_name: str = "rag_collection"):
+        self.path = Path(persist_directory) / f"neighbourhood_{collection_name}.json"
+        self.parents: Dict[str, Dict] = {}
+        self.generation = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self, generation=None):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                parents = json.load(f)
+        except FileNotFoundError:
+            parents = {}
+        self.parents = parents
+        self.generation = generation
+        logger.info(f"Neighbourhood index loaded with {len(parents)} parents.")
+
+    def update(self, documents: List[Document], chunks: List[Document]):
+        """Record parent texts and chunk spans of freshly ingested documents and persist them."""
+        texts = {parent_id_for(doc.metadata): doc.page_content for doc in documents}
+        spans: Dict[str, List] = {}
+        for chunk in chunks:
+            parent_id = chunk.metadata.get("parent_id")
+            if parent_id not in texts:
+                continue
+            start = chunk.metadata.get("start_index", -1)
+            spans.setdefault(parent_id, []).append(
+                (chunk.metadata["chunk_index"], start, start + len(chunk.page_content) if start >= 0 else -1)
+            )
+
+        with self._lock:
+            parents = dict(self.parents)
+            for parent_id, entries in spans.items():
+                entries.sort()
+                parents[parent_id] = {"text": texts[parent_id], "spans": [[s, e] for _, s, e in entries]}
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(parents, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.parents = parents
+        logger.info(f"Neighbourhood index updated for {len(spans)} parents.")
+
+    def _window(self, spans: List, index: int, hit_chars: int) -> Tuple[int, int]:
+        """Grow [index, index] alternately right and left while the slice fits in `hit_chars`."""
+        def fits(lo_next: int, hi_next: int) -> bool:
+            return (0 <= lo_next and hi_next < len(spans) and spans[lo_next][0] >= 0
+                    and spans[hi_next][1] >= 0 and spans[hi_next][1] - spans[lo_next][0] <= hit_chars)
+
+        lo = hi = index
+        grew = True
+        while grew:
+            grew = False
+            if fits(lo, hi + 1):
+                hi, grew = hi + 1, True
+            if fits(lo - 1, hi):
+                lo, grew = lo - 1, True
+        return lo, hi
+
+    @staticmethod
+    def _matches(parent: Dict, hit: Document) -> bool:
+        """
+        The hit is the chunk the stored span describes. Imports append to the collection, so
+        chunks from an earlier import with another chunking keep ordinals that no longer fit.
+        """
+        index = hit.metadata.get("chunk_index")
+        if index is None or not 0 <= index < len(parent["spans"]):
+            return False
+        start, end = parent["spans"][index]
+        return (start >= 0 and start == hit.metadata.get("start_index")
+                and parent["text"][start:end] == hit.page_content)
+
+    def expand(self, hits: List[Document], hit_chars: int = 1200, context_chars: int = 6000) -> List[str]:
+        """
+        Widen each hit to its neighbouring chunks within `hit_chars`, merge overlapping or
+        adjacent windows of the same parent, and stop adding passages at `context_chars`.
+        Parents appear in the rank order of their best hit, passages of one parent in
+        document order. Hits without matching neighbourhood data (ingested before this index
+        existed, or with a chunking that the latest import replaced) are returned unchanged.
+        """
+        parents = self.parents
+        windows: Dict[str, List] = {}
+        order: List = []
+        for hit in hits:
+            parent_id = hit.metadata.get("parent_id")
+            parent = parents.get(parent_id)
+            if parent is None or not self._matches(parent, hit):
+                order.append(("raw", hit.page_content))
+                continue
+            lo, hi = self._window(parent["spans"], hit.metadata["chunk_index"], hit_chars)
+            if parent_id not in windows:
+                windows[parent_id] = []
+                order.append(("parent", parent_id))
+            windows[parent_id].append([lo, hi])
+
+        passages, total = [], 0
+        for kind, value in order:
+            if kind == "raw":
+                texts = [value]
+            else:
+                parent = parents[value]
+                merged = []
+                for lo, hi in sorted(windows[value]):
+                    if merged and lo <= merged[-1][1] + 1:
+                        merged[-1][1] = max(merged[-1][1], hi)
+                    else:
+                        merged.append([lo, hi])
+                texts = [parent["text"][parent["spans"][lo][0]:parent["spans"][hi][1]] for lo, hi in merged]
+            for text in texts:
+                if passages and total + len(text) > context_chars:
+                    return passages
+                passages.append(text)
+                total += len(text)
+        return passages
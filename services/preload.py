@@ -0,0 +1,39 @@
+import gc
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_for_fork():
+    """
+    Run once in the server's parent process after the app (and with it the embedding
+    model, the FAQ index and any quantized index snapshot) has been imported, right
+    before workers are forked.
+    - Chroma systems (SQLite and Rust runtime state) are stopped and evicted from
+      chromadb's client cache, and the database connection is closed; none of them may be
+      shared across processes, so each worker opens its own on first use.
+    - Surviving objects are moved to the permanent GC generation so garbage collection
+      in the workers does not write to (and un-share) the parent's pages.
+    """
+    from db.db import db
+    from services.import_service import vectorstore_object
+    from services.faq_service import faq_index_object
+
+    for store in (vectorstore_object, faq_index_object.store):
+        store.release_client()
+    if not db.is_closed():
+        db.close()
+
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded models and index snapshot; %d objects frozen for copy-on-write.", gc.get_freeze_count())
+
+
+def after_fork():
+    """Run in every worker right after fork to rebuild per-process runtime state."""
+    from services.import_service import embedder_object
+    from services.query_service import chat_engine
+
+    embedder_object.after_fork()
+    chat_engine.after_fork()
+    logger.info("Worker runtime state initialized after fork.")
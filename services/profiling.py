@@ -0,0 +1,209 @@
+import cProfile
+import heapq
+import io
+import itertools
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from utilities.utills import is_valid_key
+
+load_dotenv()
+
+PROFILE_HEADER = "x-profile"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests, 0 = off
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", "20"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+logger = logging.getLogger(__name__)
+
+# Only one cProfile profiler may be active per interpreter on recent Pythons (3.12+
+# also observes every thread); concurrent profiled requests still get sampled stacks
+_cprofile_lock = threading.Lock()
+
+
+class ProfileSession:
+    """
+    Profiles work run through `run()` on the calling thread:
+    - cProfile function statistics (when no other cProfile session is active),
+    - a stack sampler producing collapsed stacks ("a;b;c count") for flamegraphs.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+        self.stacks = Counter()
+        self.stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    def _sample(self, thread_id: int, stop: threading.Event):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":"))
+                frame = frame.f_back
+            if stack:
+                with self._lock:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def _add_stats(self, profiler: cProfile.Profile):
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+
+    def run(self, fn: Callable, *args):
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), stop),
+                                   name="profile-sampler", daemon=True)
+        profiler = cProfile.Profile() if _cprofile_lock.acquire(blocking=False) else None
+        sampler.start()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            return fn(*args)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _cprofile_lock.release()
+                self._add_stats(profiler)
+            stop.set()
+            sampler.join()
+
+    def stats_text(self, limit: int = 60) -> str:
+        if self.stats is None:
+            return "No cProfile statistics (another profiled request held the profiler).\n"
+        out = io.StringIO()
+        self.stats.stream = out
+        self.stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def collapsed_text(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, reason: str, duration_ms: float, session: ProfileSession):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.duration_ms = duration_ms
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.stats = session.stats_text()
+        self.collapsed = session.collapsed_text()
+        self.has_cprofile = session.stats is not None
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "duration_ms": round(self.duration_ms, 1),
+            "created_at": self.created_at,
+            "cprofile": self.has_cprofile,
+        }
+
+
+class ProfileStore:
+    """
+    Bounded in-memory profile store.
+    - Sampled profiles: only the slowest `size` are kept.
+    - Explicitly requested profiles: the most recent `size` are kept, regardless of speed.
+    """
+
+    def __init__(self, size: int = PROFILE_STORE_SIZE):
+        self.size = size
+        self._slowest: List[tuple] = []  # min-heap of (duration_ms, seq, profile)
+        self._requested = deque(maxlen=size)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            if profile.reason == "requested":
+                self._requested.append(profile)
+                return
+            entry = (profile.duration_ms, next(self._seq), profile)
+            if len(self._slowest) < self.size:
+                heapq.heappush(self._slowest, entry)
+            elif profile.duration_ms > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            profiles = [entry[2] for entry in self._slowest] + list(self._requested)
+        return [p.summary() for p in sorted(profiles, key=lambda p: p.duration_ms, reverse=True)]
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in itertools.chain((entry[2] for entry in self._slowest), self._requested):
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+
+# Global instance
+profile_store = ProfileStore()
+
+
+def profile_reason(requested: bool, authorized: bool, sample_rate: float = PROFILE_SAMPLE_RATE) -> Optional[str]:
+    """Why this request should be profiled, or None. The header is only honoured with a valid API key."""
+    if requested and authorized:
+        return "requested"
+    if sample_rate > 0 and random.random() < sample_rate:
+        return "sampled"
+    return None
+
+
+async def run_profiled(request, fn: Callable, *args):
+    """
+    Run blocking endpoint work in the threadpool, under the request's ProfileSession
+    when the profiling middleware attached one.
+    """
+    session = getattr(request.state, "profile_session", None)
+    if session is None:
+        return await run_in_threadpool(fn, *args)
+    return await run_in_threadpool(session.run, fn, *args)
+
+
+async def profiling_middleware(request, call_next):
+    path = request.url.path
+    if not path.startswith("/api/") or path.startswith("/api/admin/"):
+        return await call_next(request)
+
+    reason = profile_reason(PROFILE_HEADER in request.headers, is_valid_key(request.headers.get("x_api_key")))
+    if reason is None:
+        return await call_next(request)
+
+    session = ProfileSession()
+    request.state.profile_session = session
+    started = time.perf_counter()
+    response = await call_next(request)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    if "content-length" not in response.headers:
+        # Streaming responses (e.g. NDJSON batches) do their work while the body is sent,
+        # after call_next returns and outside run_profiled: the profile would be empty
+        logger.info("Not recording profile of streaming response %s %s.", request.method, path)
+        return response
+
+    profile = RequestProfile(request.method, request.url.path, reason, duration_ms, session)
+    profile_store.add(profile)
+    response.headers["X-Profile-Id"] = profile.id
+    logger.info("Profiled %s %s (%s) in %.1f ms: %s", request.method, request.url.path, reason, duration_ms, profile.id)
+    return response
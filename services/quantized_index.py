@@ -0,0 +1,182 @@
+import argparse
+import logging
+import random
+import time
+from typing import List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("int8", "binary")
+
+# Number of set bits for every possible byte value (used for Hamming distance)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Rows scored per step so int8 -> float32 upcasts stay small on large corpora
+_BLOCK_ROWS = 65536
+
+
+class QuantizedIndex:
+    """
+    Compact in-memory copy of the chunk embeddings used for first-pass candidate search.
+    - int8: per-dimension symmetric scalar quantisation (4x smaller than float32),
+      candidates ranked by approximate L2 distance.
+    - binary: one sign bit per dimension (32x smaller), candidates ranked by Hamming distance.
+    Candidates are expected to be rescored against full-precision vectors by the caller.
+    """
+
+    def __init__(self, mode: str = "int8"):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.mode = mode
+        self.ids: List[str] = []
+        self.codes = None
+        self.scale = None
+        self.norms = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        if self.codes is None:
+            return 0
+        extra = sum(arr.nbytes for arr in (self.scale, self.norms) if arr is not None)
+        return self.codes.nbytes + extra
+
+    def build(self, ids: Sequence[str], embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        self.ids = list(ids)
+        if len(self.ids) == 0:
+            self.codes, self.scale, self.norms = None, None, None
+            return
+
+        if self.mode == "int8":
+            scale = np.abs(vectors).max(axis=0) / 127.0
+            scale[scale == 0] = 1.0
+            self.scale = scale.astype(np.float32)
+            self.codes = np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+            self.norms = ((self.codes * self.scale) ** 2).sum(axis=1).astype(np.float32)
+        else:
+            self.codes = np.packbits(vectors > 0, axis=1)
+        logger.info(f"Built {self.mode} quantized index: {len(self.ids)} vectors, {self.nbytes} bytes")
+
+    def _int8_distances(self, query: np.ndarray) -> np.ndarray:
+        scaled_query = query * self.scale
+        dots = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), _BLOCK_ROWS):
+            block = self.codes[start:start + _BLOCK_ROWS].astype(np.float32)
+            dots[start:start + _BLOCK_ROWS] = block @ scaled_query
+        # ||x||^2 - 2 x.q (||q||^2 is constant for ranking)
+        return self.norms - 2 * dots
+
+    def _hamming_distances(self, query: np.ndarray) -> np.ndarray:
+        query_bits = np.packbits(query > 0)
+        return _POPCOUNT[np.bitwise_xor(self.codes, query_bits)].sum(axis=1, dtype=np.int32)
+
+    def search(self, query_vector, n: int) -> List[str]:
+        """Return ids of the `n` nearest candidates by quantized distance."""
+        if not self.ids or n <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        if self.mode == "int8":
+            distances = self._int8_distances(query)
+        else:
+            distances = self._hamming_distances(query)
+
+        n = min(n, len(self.ids))
+        top = np.argpartition(distances, n - 1)[:n]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [self.ids[i] for i in top]
+
+
+def rescore(query_vector, ids: Sequence[str], embeddings, k: int) -> List[int]:
+    """Return positions (into `ids`) of the `k` closest full-precision vectors by L2 distance."""
+    if len(ids) == 0:
+        return []
+    query = np.asarray(query_vector, dtype=np.float32)
+    full = np.asarray(embeddings, dtype=np.float32)
+    distances = ((full - query) ** 2).sum(axis=1)
+    return list(np.argsort(distances, kind="stable")[:k])
+
+
+def exact_search(query_vector, ids: Sequence[str], embeddings, k: int) -> List[str]:
+    return [ids[i] for i in rescore(query_vector, ids, embeddings, k)]
+
+
+def evaluate_recall(ids: Sequence[str], embeddings, query_vectors, k: int = 14,
+                    rescore_factor: int = 4, modes: Sequence[str] = QUANTIZATION_MODES) -> List[dict]:
+    """
+    Measure recall@k of quantized search (with and without rescoring) against exact search.
+    """
+    ids = list(ids)
+    full = np.asarray(embeddings, dtype=np.float32)
+    position = {doc_id: i for i, doc_id in enumerate(ids)}
+    exact = [set(exact_search(q, ids, full, k)) for q in query_vectors]
+
+    reports = []
+    for mode in modes:
+        index = QuantizedIndex(mode)
+        index.build(ids, full)
+
+        first_pass_hits, rescored_hits, elapsed = 0, 0, 0.0
+        for query, truth in zip(query_vectors, exact):
+            started = time.perf_counter()
+            candidates = index.search(query, k * rescore_factor)
+            rows = [position[c] for c in candidates]
+            top = [candidates[i] for i in rescore(query, candidates, full[rows], k)]
+            elapsed += time.perf_counter() - started
+
+            first_pass_hits += len(truth & set(candidates[:k]))
+            rescored_hits += len(truth & set(top))
+
+        total = max(sum(len(t) for t in exact), 1)
+        reports.append({
+            "mode": mode,
+            "k": k,
+            "rescore_factor": rescore_factor,
+            "recall_first_pass": first_pass_hits / total,
+            "recall_rescored": rescored_hits / total,
+            "index_bytes": index.nbytes,
+            "float32_bytes": full.nbytes,
+            "avg_search_ms": elapsed * 1000 / max(len(query_vectors), 1),
+        })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report recall loss of quantized search against exact search.")
+    parser.add_argument("--k", type=int, default=14)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--queries", help="Text file with one query per line. Defaults to sampled chunk texts.")
+    parser.add_argument("--samples", type=int, default=200, help="Number of chunk texts to sample as queries.")
+    args = parser.parse_args()
+
+    from services.import_service import vectorstore_object, embedder_object
+
+    records = vectorstore_object.vectorstore.get(include=["embeddings", "documents"])
+    if not records["ids"]:
+        print("Vector store is empty; run the import first.")
+        return
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        documents = records["documents"]
+        queries = [doc[:200] for doc in random.sample(documents, min(args.samples, len(documents)))]
+    query_vectors = embedder_object.model.embed_documents(queries)
+
+    reports = evaluate_recall(records["ids"], records["embeddings"], query_vectors,
+                              k=args.k, rescore_factor=args.rescore_factor)
+    print(f"{len(records['ids'])} vectors, {len(queries)} queries, k={args.k}, rescore_factor={args.rescore_factor}")
+    print(f"{'mode':<8}{'recall (1st pass)':>20}{'recall (rescored)':>20}{'size ratio':>12}{'avg ms':>10}")
+    for r in reports:
+        ratio = r["float32_bytes"] / max(r["index_bytes"], 1)
+        print(f"{r['mode']:<8}{r['recall_first_pass']:>20.4f}{r['recall_rescored']:>20.4f}"
+              f"{ratio:>11.1f}x{r['avg_search_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os
+import time
 import logging
+from typing import Callable, Iterator, Optional, Union
 from dotenv import load_dotenv
 from langchain_core.runnables import RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
@@ -10,29 +12,61 @@ from services.prompt import base_prompt
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 #from sentence_transformers import CrossEncoder
 
-from services.import_service import vectorstore_object, embedder_object
+from services.import_service import vectorstore_object, embedder_object, neighbourhood_index_object
+from services.faq_service import faq_index_object, is_follow_up, FAQ_FASTPATH
+from services.metrics import metrics
+from services.llm_governor import LLMGovernor, LLMOverloadedError, prompt_fingerprint
 from models.messages import message_service_object
 
 load_dotenv()
 
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "14"))
+
+# Small-to-big retrieval: search small chunks with a low k, then expand hits to their neighbours
+SMALL_TO_BIG = os.getenv("SMALL_TO_BIG", "false").lower() == "true"
+SMALL_TO_BIG_K = int(os.getenv("SMALL_TO_BIG_K", "4"))
+SMALL_TO_BIG_HIT_CHARS = int(os.getenv("SMALL_TO_BIG_HIT_CHARS", "1200"))
+SMALL_TO_BIG_CONTEXT_CHARS = int(os.getenv("SMALL_TO_BIG_CONTEXT_CHARS", "6000"))
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF_S = float(os.getenv("LLM_RETRY_BACKOFF_S", "0.5"))
+
+OVERLOAD_MESSAGE = ("We're receiving a lot of questions right now. "
+                    "Please try again in a moment.")
+# Returned when the LLM missed its deadline or kept failing after all retries
+LLM_UNAVAILABLE_MESSAGE = ("Sorry, I couldn't get an answer to that right now. "
+                           "Please try again in a moment.")
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ChatEngine:
     context_dict = {}
-    def __init__(self):
+    def __init__(self, llm=None, governor: Optional[LLMGovernor] = None):
+        """
+        `llm` defaults to Gemini; any LangChain chat model (e.g. FakeListChatModel) can be passed instead.
+        """
         self.parser = StrOutputParser()
-        self.llm = ChatGoogleGenerativeAI(
-            model=os.getenv("GEMINI_MODEL"),
-            callbacks= [StreamingStdOutCallbackHandler()],
-            disable_streaming=False,    
-            )
+        self._default_llm = llm is None
+        self.llm = llm or self._build_llm()
         self.chain = self._build_chain()
+        self.governor = governor or LLMGovernor(
+            max_concurrency=LLM_MAX_CONCURRENCY,
+            max_queue=LLM_MAX_QUEUE,
+            timeout=LLM_TIMEOUT_S,
+            max_retries=LLM_MAX_RETRIES,
+            backoff=LLM_RETRY_BACKOFF_S
+        )
 
         self.vectorstore_object = vectorstore_object
         self.embedder_object = embedder_object
+        self.neighbourhood_index = neighbourhood_index_object if SMALL_TO_BIG else None
         self.message_service = message_service_object
+        self.faq_index = faq_index_object if FAQ_FASTPATH else None
 
         self.folder_path = os.getenv("DATA_FOLDER_PATH")
         self.embedding_model_name = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
@@ -41,6 +75,26 @@ class ChatEngine:
 
         logger.info("ChatEngine initialized.")
 
+    def _build_llm(self):
+        # Retries and deadlines are handled by the governor, not the client
+        return ChatGoogleGenerativeAI(
+            model=os.getenv("GEMINI_MODEL"),
+            callbacks= [StreamingStdOutCallbackHandler()],
+            disable_streaming=False,
+            timeout=LLM_TIMEOUT_S,
+            max_retries=0,
+            )
+
+    def after_fork(self):
+        """
+        Rebuild the Gemini client in a forked worker: it talks gRPC, and a gRPC channel
+        created in the parent must not be used by a child process.
+        """
+        if self._default_llm:
+            self.llm = self._build_llm()
+            self.chain = self._build_chain()
+            logger.info("LLM client rebuilt after fork.")
+
     def _format_history(self, messages: list):
         history = []
         for message in messages:
@@ -103,11 +157,26 @@ class ChatEngine:
 
 
 
-    def retrieve_context(self, query: str, k: int = 14) -> str:
-        result_vectors = self.vectorstore_object.similarity_search(query=query, k=k)
+    def _expand_hits(self, hits: list) -> list:
+        """Small-to-big: widen small-chunk hits to their neighbourhood within the size budget."""
+        index = self.neighbourhood_index
+        if index.generation != self.vectorstore_object.generation:
+            index.load(self.vectorstore_object.generation)
+        return index.expand(hits, hit_chars=SMALL_TO_BIG_HIT_CHARS, context_chars=SMALL_TO_BIG_CONTEXT_CHARS)
+
+    def retrieve_context(self, query: str, k: Optional[int] = None, query_vector: Optional[list] = None) -> str:
+        if k is None:
+            k = SMALL_TO_BIG_K if self.neighbourhood_index is not None else RETRIEVAL_K
+        if query_vector is not None:
+            result_vectors = self.vectorstore_object.similarity_search_by_vector(query_vector, k=k)
+        else:
+            result_vectors = self.vectorstore_object.similarity_search(query=query, k=k)
         context = result_vectors
         print(len(context),type(context))
-        context = "\n".join([doc.page_content for doc in context])
+        if self.neighbourhood_index is not None:
+            context = "\n\n".join(self._expand_hits(result_vectors))
+        else:
+            context = "\n".join([doc.page_content for doc in context])
         #context = "\n".join([doc.page_content for doc in result_vectors])
 
         logger.info("Retrieved context for query: '%s' with %d documents.", query, len(result_vectors))
@@ -149,22 +218,74 @@ class ChatEngine:
         # return "\n".join(self.context_dict[user_id][session_id][::-1])
         return "\n".join(self.context_dict[user_id][session_id][::-1])
 
-    def run_chat(self, query: str, session_id: str, user_id: str) -> str:
-
-        self.save_user_message(query, session_id, user_id)
-
-        context = self.retrieve_context(query)
+    def _build_inputs(self, query: str, session_id: str, user_id: str,
+                      context: Union[str, Callable[[], str], None] = None, remember_context: bool = True) -> dict:
+        if context is None:
+            context = self.retrieve_context(query)
+        elif callable(context):
+            context = context()
         chat_history = self.get_chat_history(session_id, user_id)
 
-        prev_context = self.update_dict(context,session_id,user_id)
+        prev_context = self.update_dict(context,session_id,user_id) if remember_context else context
 
-        response = self.chain.invoke({
+        return {
             "question": query,
             "context": context,
             "chat_history": chat_history,
             "prev_context": prev_context
-        })
+        }
+
+    def answer_from_faq(self, query: str, session_id: str, user_id: str) -> Optional[str]:
+        """
+        Return the stored FAQ answer when the query closely matches an FAQ question
+        and is not a follow-up that needs the conversation history.
+        """
+        if self.faq_index is None:
+            return None
+        started = time.perf_counter()
+
+        if is_follow_up(query, self.get_chat_history(session_id, user_id, limit=2)):
+            metrics.increment("chat.faq_fastpath.follow_up")
+            return None
+
+        match = self.faq_index.match(query)
+        if match is None:
+            metrics.increment("chat.faq_fastpath.miss")
+            return None
+
+        metrics.increment("chat.faq_fastpath.hit")
+        metrics.observe("chat.faq_fastpath.latency_ms", (time.perf_counter() - started) * 1000)
+        logger.info("[faq-fastpath] Answered '%s' from FAQ '%s' (score=%.3f).", query, match.question, match.score)
+        return match.answer
+
+    def run_chat(self, query: str, session_id: str, user_id: str,
+                 context: Union[str, Callable[[], str], None] = None, remember_context: bool = True) -> str:
+        """
+        Batch runs pass `context` (or a callable producing it, only called when the FAQ fast
+        path does not answer) and `remember_context=False` to keep their one-off sessions
+        out of `context_dict`.
+        """
+
+        faq_answer = self.answer_from_faq(query, session_id, user_id)
+
+        self.save_user_message(query, session_id, user_id)
 
+        if faq_answer is not None:
+            self.save_bot_message(faq_answer, session_id, user_id)
+            return faq_answer
+
+        inputs = self._build_inputs(query, session_id, user_id, context, remember_context)
+        try:
+            response = self.governor.invoke(prompt_fingerprint(inputs), lambda: self.chain.invoke(dict(inputs)))
+        except LLMOverloadedError:
+            logger.warning("LLM overloaded; returning overload response for query: '%s'", query)
+            response = OVERLOAD_MESSAGE
+        except Exception as e:
+            # Deadline missed or retries exhausted; the governor already logged the attempts
+            logger.error("LLM call failed for query '%s': %s", query, e)
+            response = LLM_UNAVAILABLE_MESSAGE
+
+        # The user turn is already saved, so every outcome gets a bot reply
         self.save_bot_message(response, session_id, user_id)
 
 
@@ -175,5 +296,41 @@ class ChatEngine:
         return response
 
 
+    def stream_chat(self, query: str, session_id: str, user_id: str) -> Iterator[str]:
+        """
+        Like run_chat, but yields the answer as LLM tokens arrive (voice streaming).
+        Streams are not coalesced, but get the governor's slots, deadline and retries.
+        """
+        faq_answer = self.answer_from_faq(query, session_id, user_id)
+
+        self.save_user_message(query, session_id, user_id)
+
+        if faq_answer is not None:
+            self.save_bot_message(faq_answer, session_id, user_id)
+            yield faq_answer
+            return
+
+        inputs = self._build_inputs(query, session_id, user_id)
+        parts = []
+        try:
+            # A copy per attempt: _format_inputs replaces the chat_history rows in place
+            for token in self.governor.stream(lambda: self.chain.stream(dict(inputs))):
+                parts.append(token)
+                yield token
+        except LLMOverloadedError:
+            logger.warning("LLM overloaded; returning overload response for query: '%s'", query)
+            parts.append(OVERLOAD_MESSAGE)
+            yield OVERLOAD_MESSAGE
+        except Exception as e:
+            logger.error("LLM stream failed for query '%s': %s", query, e)
+            message = (" " if parts else "") + LLM_UNAVAILABLE_MESSAGE
+            parts.append(message)
+            yield message
+
+        response = "".join(parts)
+        self.save_bot_message(response, session_id, user_id)
+        logger.info("Streamed response for query: '%s'", query)
+
+
 # Global instance
 chat_engine = ChatEngine()
@@ -0,0 +1,180 @@
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, Tuple
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+
+from services.import_service import Chunker, document_loader_object, embedder_object
+
+logger = logging.getLogger(__name__)
+
+# Rough prompt-size estimate; good enough to compare configurations with each other
+CHARS_PER_TOKEN = 4
+
+
+def load_golden_set(path: str) -> List[dict]:
+    """
+    Golden set as a JSON list or JSONL, one entry per question:
+        {"question": "...", "expected": [{"source": "FAQS.pdf", "page": 2}, {"text": "exact phrase"}]}
+    `source` matches the file name, `page` is 1-based, `text` must appear in the chunk.
+    Any combination of the three keys may be used in one expected item.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        entries = json.loads(content)
+    else:
+        entries = [json.loads(line) for line in content.splitlines() if line.strip()]
+    for entry in entries:
+        if not entry.get("question") or not entry.get("expected"):
+            raise ValueError(f"Golden entry needs 'question' and 'expected': {entry}")
+    return entries
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def matches_expected(doc: Document, expected: dict) -> bool:
+    source = os.path.basename(str(doc.metadata.get("source", ""))).lower()
+    if "source" in expected and expected["source"].lower() not in source:
+        return False
+    if "page" in expected:
+        page = doc.metadata.get("page")
+        if page is None or int(page) + 1 != int(expected["page"]):
+            return False
+    if "text" in expected and _normalize(expected["text"]) not in _normalize(doc.page_content):
+        return False
+    return True
+
+
+def score_results(docs: List[Document], expected: List[dict]) -> Tuple[float, float]:
+    """Return (recall, reciprocal rank) of one ranked result list."""
+    found = [any(matches_expected(doc, item) for doc in docs) for item in expected]
+    recall = sum(found) / len(expected)
+    for rank, doc in enumerate(docs, start=1):
+        if any(matches_expected(doc, item) for item in expected):
+            return recall, 1.0 / rank
+    return recall, 0.0
+
+
+def _build_index(chunks: List[Document]) -> Chroma:
+    # In-memory collection; nothing touches CHROMA_DB_PATH
+    store = Chroma(collection_name=f"tuning_{uuid.uuid4().hex}", embedding_function=embedder_object.model)
+    store.add_documents(chunks)
+    return store
+
+
+def sweep(golden: List[dict], documents: List[Document], chunk_sizes: List[int],
+          overlaps: List[int], ks: List[int]) -> List[Dict]:
+    questions = [entry["question"] for entry in golden]
+    query_vectors = embedder_object.model.embed_documents(questions)
+
+    results = []
+    for chunk_size in chunk_sizes:
+        for overlap in overlaps:
+            if overlap >= chunk_size:
+                continue
+            chunks = Chunker(chunk_size=chunk_size, chunk_overlap=overlap).split_documents(documents)
+            build_started = time.perf_counter()
+            store = _build_index(chunks)
+            build_seconds = time.perf_counter() - build_started
+
+            for k in ks:
+                recall_sum, rr_sum, latency_sum, chars_sum = 0.0, 0.0, 0.0, 0
+                for entry, vector in zip(golden, query_vectors):
+                    started = time.perf_counter()
+                    docs = store.similarity_search_by_vector(vector, k=k)
+                    latency_sum += time.perf_counter() - started
+                    recall, rr = score_results(docs, entry["expected"])
+                    recall_sum += recall
+                    rr_sum += rr
+                    chars_sum += sum(len(doc.page_content) for doc in docs)
+
+                n = len(golden)
+                results.append({
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": overlap,
+                    "k": k,
+                    "chunks": len(chunks),
+                    "recall_at_k": recall_sum / n,
+                    "mrr": rr_sum / n,
+                    "latency_ms": latency_sum * 1000 / n,
+                    "context_tokens": chars_sum / n / CHARS_PER_TOKEN,
+                    "index_build_s": build_seconds,
+                })
+                logger.info("chunk_size=%d overlap=%d k=%d recall@k=%.3f", chunk_size, overlap, k, results[-1]["recall_at_k"])
+            store.delete_collection()
+    return results
+
+
+def pareto_front(results: List[Dict]) -> List[Dict]:
+    """Configurations not dominated on (higher recall, fewer context tokens, lower latency)."""
+    def dominates(a, b):
+        no_worse = (a["recall_at_k"] >= b["recall_at_k"] and a["context_tokens"] <= b["context_tokens"]
+                    and a["latency_ms"] <= b["latency_ms"])
+        better = (a["recall_at_k"] > b["recall_at_k"] or a["context_tokens"] < b["context_tokens"]
+                  or a["latency_ms"] < b["latency_ms"])
+        return no_worse and better
+
+    return [r for r in results if not any(dominates(other, r) for other in results)]
+
+
+def recommend(front: List[Dict], recall_tolerance: float = 0.02) -> Dict:
+    """
+    Among Pareto-optimal configurations within `recall_tolerance` of the best recall,
+    pick the one with the smallest prompt (then higher MRR, then lower latency).
+    """
+    best_recall = max(r["recall_at_k"] for r in front)
+    candidates = [r for r in front if r["recall_at_k"] >= best_recall - recall_tolerance]
+    return min(candidates, key=lambda r: (r["context_tokens"], -r["mrr"], r["latency_ms"]))
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep chunking parameters and k against a golden question set.")
+    parser.add_argument("golden", help="Golden set (JSON list or JSONL).")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[300, 500, 750, 1000])
+    parser.add_argument("--overlaps", type=_int_list, default=[0, 50, 100, 200])
+    parser.add_argument("--ks", type=_int_list, default=[2, 4, 6, 8, 10, 14])
+    parser.add_argument("--recall-tolerance", type=float, default=0.02)
+    parser.add_argument("--out", help="Write all results as JSON to this file.")
+    args = parser.parse_args()
+
+    golden = load_golden_set(args.golden)
+    documents = document_loader_object.load_documents()
+    results = sweep(golden, documents, args.chunk_sizes, args.overlaps, args.ks)
+    if not results:
+        print("No valid configuration in the grid.")
+        return
+    front = pareto_front(results)
+    best = recommend(front, args.recall_tolerance)
+
+    print(f"{len(golden)} questions, {len(results)} configurations, {len(front)} on the Pareto front\n")
+    print(f"{'size':>6}{'overlap':>9}{'k':>4}{'recall@k':>10}{'MRR':>7}{'ms':>8}{'tokens':>9}  pareto")
+    for r in sorted(results, key=lambda r: (r["chunk_size"], r["chunk_overlap"], r["k"])):
+        mark = "*" if r in front else ""
+        print(f"{r['chunk_size']:>6}{r['chunk_overlap']:>9}{r['k']:>4}{r['recall_at_k']:>10.3f}{r['mrr']:>7.3f}"
+              f"{r['latency_ms']:>8.2f}{r['context_tokens']:>9.0f}  {mark}")
+
+    print("\nRecommended configuration (.env):")
+    print(f"CHUNK_SIZE={best['chunk_size']}")
+    print(f"CHUNK_OVERLAP={best['chunk_overlap']}")
+    print(f"RETRIEVAL_K={best['k']}")
+    print("Changing the chunking requires re-importing the documents.")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "pareto_front": front, "recommended": best}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
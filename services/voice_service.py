@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+
+from services.metrics import metrics
+from voice.backends import STTBackend, STTStream, TTSBackend
+
+load_dotenv()
+
+# Largest utterance accepted before the connection is closed
+VOICE_MAX_UTTERANCE_BYTES = int(os.getenv("VOICE_MAX_UTTERANCE_BYTES", str(10 * 1024 * 1024)))
+# Segments shorter than this are held back and merged with the next sentence before TTS
+VOICE_MIN_SEGMENT_CHARS = int(os.getenv("VOICE_MIN_SEGMENT_CHARS", "40"))
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END_RE = re.compile(r"[.!?\n](?=\s)")
+
+
+class VoiceSession:
+    """
+    One full-duplex voice conversation over a WebSocket.
+
+    Client -> server:
+      binary frames             audio chunks of the current utterance (any format ffmpeg can read)
+      {"type": "end"}           the user stopped speaking
+    Server -> client:
+      {"type": "partial", "text"}          transcription so far, while audio is still arriving
+                                           (only from STT backends with incremental streams)
+      {"type": "transcript", "text"}       final transcription of the utterance
+      {"type": "token", "text"}            LLM output as it is generated
+      {"type": "audio", "index", "text", "media_type"}  followed by one binary frame with that segment's audio
+      {"type": "done", "message"}          full answer; the session is ready for the next utterance
+      {"type": "error", "message"}
+
+    Audio is fed to the STT stream as it arrives and keeps being received while an
+    answer is generated; each sentence is synthesised as soon as the LLM finishes it.
+    `engine` is anything with ChatEngine's `stream_chat`.
+    """
+
+    def __init__(self, websocket: WebSocket, session_id: str, user_id: str,
+                 stt: STTBackend, tts: TTSBackend, engine):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.user_id = user_id
+        self.stt = stt
+        self.tts = tts
+        self.engine = engine
+        self.stream = stt.stream()
+        self.utterance_bytes = 0
+        self._last_partial = None
+        self._send_lock = asyncio.Lock()
+        self._reply_task: Optional[asyncio.Task] = None
+
+    async def _send_json(self, payload: dict, data: Optional[bytes] = None):
+        # Audio metadata and its binary frame must not be interleaved with other messages
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(payload, ensure_ascii=False))
+            if data is not None:
+                await self.websocket.send_bytes(data)
+
+    async def _feed(self, chunk: bytes):
+        try:
+            partial = await run_in_threadpool(self.stream.feed, chunk)
+        except Exception as e:
+            # The final transcription decides; a failed partial is not fatal
+            logger.debug(f"Partial transcription failed: {e}")
+            return
+        if partial and partial != self._last_partial:
+            self._last_partial = partial
+            await self._send_json({"type": "partial", "text": partial})
+
+    async def _synthesize_segments(self, segments: "asyncio.Queue[Optional[str]]"):
+        index = 0
+        while True:
+            segment = await segments.get()
+            if segment is None:
+                return
+            started = time.perf_counter()
+            audio = await run_in_threadpool(self.tts.synthesize, segment)
+            metrics.observe("voice.tts_segment_ms", (time.perf_counter() - started) * 1000)
+            await self._send_json(
+                {"type": "audio", "index": index, "text": segment, "media_type": self.tts.media_type},
+                audio
+            )
+            index += 1
+
+    async def _reply(self, stream: STTStream):
+        started = time.perf_counter()
+        text_query = (await run_in_threadpool(stream.finish)).strip()
+        metrics.observe("voice.stt_final_ms", (time.perf_counter() - started) * 1000)
+        await self._send_json({"type": "transcript", "text": text_query})
+        if not text_query:
+            await self._send_json({"type": "error", "message": "Could not transcribe audio. Please try again."})
+            return
+
+        segments: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        tts_task = asyncio.create_task(self._synthesize_segments(segments))
+        pending, parts, first_token = "", [], True
+        try:
+            tokens = self.engine.stream_chat(text_query, self.session_id, self.user_id)
+            async for token in iterate_in_threadpool(tokens):
+                if first_token:
+                    metrics.observe("voice.first_token_ms", (time.perf_counter() - started) * 1000)
+                    first_token = False
+                parts.append(token)
+                pending += token
+                await self._send_json({"type": "token", "text": token})
+
+                # Hand every finished sentence to TTS while the LLM keeps generating
+                last_end = None
+                for match in SENTENCE_END_RE.finditer(pending):
+                    if match.end() >= VOICE_MIN_SEGMENT_CHARS:
+                        last_end = match.end()
+                if last_end is not None:
+                    await segments.put(pending[:last_end].strip())
+                    pending = pending[last_end:]
+
+            if pending.strip():
+                await segments.put(pending.strip())
+        finally:
+            await segments.put(None)
+            await tts_task
+
+        metrics.observe("voice.reply_ms", (time.perf_counter() - started) * 1000)
+        await self._send_json({"type": "done", "message": "".join(parts)})
+
+    async def _run_reply(self, stream: STTStream, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await previous
+        try:
+            await self._reply(stream)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"Voice reply failed: {e}", exc_info=True)
+            await self._send_json({"type": "error", "message": f"Error processing audio: {str(e)}"})
+
+    async def run(self):
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    chunk = message["bytes"]
+                    self.utterance_bytes += len(chunk)
+                    if self.utterance_bytes > VOICE_MAX_UTTERANCE_BYTES:
+                        await self._send_json({"type": "error", "message": "Utterance too long."})
+                        await self.websocket.close(code=1009)
+                        break
+                    await self._feed(chunk)
+                elif message.get("text"):
+                    try:
+                        command = json.loads(message["text"])
+                    except json.JSONDecodeError:
+                        await self._send_json({"type": "error", "message": "Expected a JSON command."})
+                        continue
+                    if command.get("type") == "end":
+                        stream, self.stream = self.stream, self.stt.stream()
+                        self.utterance_bytes, self._last_partial = 0, None
+                        # Replies run in order, while the loop keeps receiving audio
+                        self._reply_task = asyncio.create_task(self._run_reply(stream, self._reply_task))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if self._reply_task is not None and not self._reply_task.done():
+                self._reply_task.cancel()
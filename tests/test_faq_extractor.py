@@ -0,0 +1,69 @@
+from langchain_core.documents import Document
+
+from services.faq_extractor import FaqExtractor
+
+
+def test_lettered_list_stays_inside_the_answer():
+    text = (
+        "Q-1: Which documents are required for admission?\n"
+        "Ans: Students must upload the following documents:\n"
+        "a) Class 10 marksheet\n"
+        "b) Class 12 marksheet\n"
+        "A) Aadhaar card\n"
+        "Q-2: Is there an entrance test?\n"
+        "A-2: No, admission is merit based.\n"
+    )
+
+    assert FaqExtractor()._pairs_from_text(text) == [
+        ("Which documents are required for admission?",
+         "Students must upload the following documents: a) Class 10 marksheet "
+         "b) Class 12 marksheet A) Aadhaar card"),
+        ("Is there an entrance test?", "No, admission is merit based."),
+    ]
+
+
+def test_answer_markers():
+    text = (
+        "Question 1: What is the fee for BCA?\nANSWER: Rs. 12,000 per semester.\n"
+        "Q2. When do classes start?\nA2. In the first week of August.\n"
+        "Q: Is hostel available?\nA: Yes, for outstation students.\n"
+    )
+
+    assert [a for _, a in FaqExtractor()._pairs_from_text(text)] == [
+        "Rs. 12,000 per semester.", "In the first week of August.", "Yes, for outstation students.",
+    ]
+
+
+def test_pairs_span_page_breaks():
+    documents = [
+        Document(page_content="Q-1: How do I apply for PG admission?\nAns: Fill in the online form",
+                 metadata={"source": "data/college_faq.pdf", "page": 0}),
+        Document(page_content="and upload your graduation marksheet.\nQ-2: Is there a late fee?\nAns: Yes, Rs. 500.",
+                 metadata={"source": "data/college_faq.pdf", "page": 1}),
+        Document(page_content="Q-1: Not an FAQ file?\nAns: Ignored.", metadata={"source": "data/notice.pdf"}),
+    ]
+
+    faq_docs = FaqExtractor().extract(documents)
+
+    assert [(d.page_content, d.metadata["answer"]) for d in faq_docs] == [
+        ("How do I apply for PG admission?", "Fill in the online form and upload your graduation marksheet."),
+        ("Is there a late fee?", "Yes, Rs. 500."),
+    ]
+    assert all(d.metadata["source"] == "data/college_faq.pdf" for d in faq_docs)
+
+
+def test_question_ending_with_question_mark_without_answer_marker():
+    text = (
+        "Q-1: Does the college offer\n"
+        "scholarships?\n"
+        "Yes, merit and need based scholarships\n"
+        "are announced every semester.\n"
+        "Q-2: Where is the library?\n"
+        "In the main block.\n"
+    )
+
+    assert FaqExtractor()._pairs_from_text(text) == [
+        ("Does the college offer scholarships?",
+         "Yes, merit and need based scholarships are announced every semester."),
+        ("Where is the library?", "In the main block."),
+    ]
@@ -0,0 +1,184 @@
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+from services.llm_governor import LLMGovernor, LLMOverloadedError
+from services.prompt import base_prompt
+
+
+def make_governor(**kwargs) -> LLMGovernor:
+    defaults = dict(max_concurrency=2, max_queue=4, timeout=1.0, max_retries=0, backoff=0.0)
+    defaults.update(kwargs)
+    return LLMGovernor(**defaults)
+
+
+def test_invoke_runs_fake_model_chain():
+    governor = make_governor()
+    chain = FakeListChatModel(responses=["Fees are listed on the admissions page."]) | StrOutputParser()
+
+    assert governor.invoke("fp", lambda: chain.invoke("What is the fee?")) == "Fees are listed on the admissions page."
+
+
+def test_single_flight_shares_one_upstream_call():
+    governor = make_governor()
+    calls, started = [], threading.Event()
+
+    def slow_call():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(governor.invoke("same", slow_call)))
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=lambda: results.append(governor.invoke("same", slow_call)))
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert results == ["answer", "answer"]
+    assert len(calls) == 1
+
+
+def test_full_queue_rejects_new_calls():
+    governor = make_governor(max_concurrency=1, max_queue=0)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking_call():
+        started.set()
+        release.wait(1)
+        return "done"
+
+    holder = threading.Thread(target=governor.invoke, args=("first", blocking_call))
+    holder.start()
+    started.wait(1)
+    try:
+        with pytest.raises(LLMOverloadedError):
+            governor.invoke("second", lambda: "never")
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_deadline_raises_timeout():
+    governor = make_governor(timeout=0.1)
+
+    with pytest.raises(TimeoutError):
+        governor.invoke("slow", lambda: time.sleep(0.5))
+
+
+def test_failures_are_retried():
+    governor = make_governor(max_retries=2)
+    attempts = []
+
+    def flaky_call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("upstream unavailable")
+        return "ok"
+
+    assert governor.invoke("flaky", flaky_call) == "ok"
+    assert len(attempts) == 3
+
+
+def test_stream_yields_fake_model_tokens():
+    governor = make_governor()
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="Admissions open in June")]))
+    chain = model | StrOutputParser()
+
+    tokens = list(governor.stream(lambda: chain.stream("When do admissions open?")))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Admissions open in June"
+
+
+def test_stream_deadline_covers_the_whole_stream():
+    governor = make_governor(timeout=0.2)
+
+    def slow_tokens():
+        for token in ["a", "b", "c"]:
+            time.sleep(0.15)
+            yield token
+
+    received = []
+    with pytest.raises(TimeoutError):
+        for token in governor.stream(slow_tokens):
+            received.append(token)
+    assert received == ["a"]
+
+
+def test_stream_retries_only_before_the_first_token():
+    governor = make_governor(max_retries=1)
+    attempts = []
+
+    def fails_before_first_token():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("upstream unavailable")
+        yield "ok"
+
+    assert list(governor.stream(fails_before_first_token)) == ["ok"]
+
+    def fails_after_first_token():
+        yield "partial"
+        raise ConnectionError("connection reset")
+
+    received = []
+    with pytest.raises(ConnectionError):
+        for token in governor.stream(fails_after_first_token):
+            received.append(token)
+    assert received == ["partial"]
+
+
+class FlakyChatModel(GenericFakeChatModel):
+    """Fails `failures` times before its first token, then streams the fake response."""
+
+    failures: int = 1
+
+    def _stream(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("upstream unavailable")
+        yield from super()._stream(*args, **kwargs)
+
+
+class Row:
+    """Stand-in for a stored chat message row."""
+
+    def __init__(self, role: str, message: str):
+        self.role = role
+        self.message = message
+
+
+def format_inputs(inputs: dict) -> dict:
+    # Same shape as ChatEngine._format_inputs: rows are turned into messages in place
+    history = [HumanMessage(content=m.message) if m.role == "user" else AIMessage(content=m.message)
+               for m in inputs["chat_history"]]
+    inputs.update(chat_history=history)
+    return inputs
+
+
+def test_stream_retry_with_chat_engine_shaped_chain():
+    governor = make_governor(max_retries=1)
+    model = FlakyChatModel(messages=iter([AIMessage(content="The BCA fee is listed on the fee page.")]))
+    chain = RunnableLambda(format_inputs) | base_prompt | model | StrOutputParser()
+    inputs = {
+        "question": "And the fee?",
+        "context": "BCA fee details",
+        "prev_context": "BCA fee details",
+        "chat_history": [Row("user", "Tell me about BCA"), Row("bot", "BCA is a 3-year course.")],
+    }
+
+    # Each attempt formats its own copy, as ChatEngine.stream_chat does
+    tokens = list(governor.stream(lambda: chain.stream(dict(inputs))))
+
+    assert "".join(tokens) == "The BCA fee is listed on the fee page."
+    assert all(isinstance(row, Row) for row in inputs["chat_history"])
@@ -0,0 +1,68 @@
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from services.voice_service import VoiceSession
+from voice.backends import TextSTT, TextTTS
+
+ANSWER_TOKENS = ["Admissions open in June ", "for all undergraduate programmes. ",
+                 "Fees are listed on the admissions page."]
+
+
+class FakeEngine:
+    def __init__(self):
+        self.queries = []
+
+    def stream_chat(self, query: str, session_id: str, user_id: str):
+        self.queries.append((query, session_id, user_id))
+        yield from ANSWER_TOKENS
+
+
+def make_client(engine: FakeEngine) -> TestClient:
+    app = FastAPI()
+
+    @app.websocket("/voice")
+    async def voice(websocket: WebSocket):
+        await websocket.accept()
+        await VoiceSession(websocket, "s1", "u1", TextSTT(), TextTTS(), engine).run()
+
+    return TestClient(app)
+
+
+def receive_reply(ws) -> list:
+    messages = []
+    while True:
+        message = ws.receive_json()
+        if message["type"] == "audio":
+            message["data"] = ws.receive_bytes()
+        messages.append(message)
+        if message["type"] in ("done", "error"):
+            return messages
+
+
+def test_voice_round_trip_with_text_backends():
+    engine = FakeEngine()
+    with make_client(engine).websocket_connect("/voice") as ws:
+        ws.send_bytes("When do ".encode("utf-8"))
+        ws.send_bytes("admissions open?".encode("utf-8"))
+        ws.send_json({"type": "end"})
+        messages = receive_reply(ws)
+
+    partials = [m["text"] for m in messages if m["type"] == "partial"]
+    assert partials == ["When do", "When do admissions open?"]
+    assert [m["text"] for m in messages if m["type"] == "transcript"] == ["When do admissions open?"]
+    assert engine.queries == [("When do admissions open?", "s1", "u1")]
+
+    assert "".join(m["text"] for m in messages if m["type"] == "token") == "".join(ANSWER_TOKENS)
+    audio = [m for m in messages if m["type"] == "audio"]
+    assert [m["index"] for m in audio] == list(range(len(audio)))
+    assert all(m["media_type"] == "text/plain" and m["data"] == m["text"].encode("utf-8") for m in audio)
+    assert " ".join(m["text"] for m in audio) == "".join(ANSWER_TOKENS).strip()
+    assert messages[-1] == {"type": "done", "message": "".join(ANSWER_TOKENS)}
+
+
+def test_oversized_utterance_closes_the_connection(monkeypatch):
+    monkeypatch.setattr("services.voice_service.VOICE_MAX_UTTERANCE_BYTES", 8)
+    with make_client(FakeEngine()).websocket_connect("/voice") as ws:
+        ws.send_bytes(b"x" * 9)
+        assert ws.receive_json() == {"type": "error", "message": "Utterance too long."}
+        assert ws.receive()["code"] == 1009
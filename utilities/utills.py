@@ -7,7 +7,10 @@ api_key_header = APIKeyHeader(name="x_api_key",auto_error=False)
 load = load_dotenv()
 key = os.getenv("API_KEY")
 
+def is_valid_key(x_api_key: str) -> bool:
+    return x_api_key is not None and x_api_key == key
+
 def verify_key(x_api_key: str = Depends(api_key_header)):
-    if x_api_key != key:
+    if not is_valid_key(x_api_key):
         raise HTTPException(status_code=401,detail="Invalid key")
     return x_api_key
\ No newline at end of file
@@ -0,0 +1,151 @@
+import codecs
+import io
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class STTStream(ABC):
+    """Transcription state of one utterance, fed with audio chunks as they arrive."""
+
+    @abstractmethod
+    def feed(self, chunk: bytes) -> Optional[str]:
+        """Add a chunk; return the transcript so far when the backend has a new one, else None."""
+
+    @abstractmethod
+    def finish(self) -> str:
+        """Final transcript of the utterance."""
+
+
+class BufferedSTTStream(STTStream):
+    """
+    For backends that only transcribe complete recordings: chunks are collected and the
+    recording is transcribed once at the end (no partial transcripts).
+    """
+
+    def __init__(self, backend: "STTBackend"):
+        self.backend = backend
+        self.chunks: List[bytes] = []
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        self.chunks.append(chunk)
+        return None
+
+    def finish(self) -> str:
+        return self.backend.transcribe(b"".join(self.chunks))
+
+
+class STTBackend(ABC):
+    """Speech-to-text backend: turns a complete recording into text."""
+
+    @abstractmethod
+    def transcribe(self, audio: bytes) -> str:
+        ...
+
+    def stream(self) -> STTStream:
+        """Start transcribing an utterance; streaming backends override this with real incremental state."""
+        return BufferedSTTStream(self)
+
+
+class TTSBackend(ABC):
+    """Text-to-speech backend: turns one text segment into a playable audio clip."""
+
+    media_type = "audio/mpeg"
+
+    @abstractmethod
+    def synthesize(self, text: str) -> bytes:
+        ...
+
+
+class GoogleSTT(STTBackend):
+    """
+    Google Web Speech API via speech_recognition, like voice/stt.py but in memory.
+    The API only takes complete recordings, so utterances are transcribed once, at the end.
+    """
+
+    def transcribe(self, audio: bytes) -> str:
+        import speech_recognition as sr
+        from pydub import AudioSegment
+
+        if not audio:
+            return ""
+        # Convert any format -> wav
+        wav = io.BytesIO()
+        AudioSegment.from_file(io.BytesIO(audio)).export(wav, format="wav")
+        wav.seek(0)
+
+        r = sr.Recognizer()
+        with sr.AudioFile(wav) as source:
+            recorded = r.record(source)
+        try:
+            return r.recognize_google(recorded)
+        except sr.UnknownValueError:
+            return ""
+
+
+class GTTSBackend(TTSBackend):
+    """gTTS, like voice/tts.py but returning the MP3 bytes instead of writing a file."""
+
+    def synthesize(self, text: str) -> bytes:
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class TextSTTStream(STTStream):
+    """Decodes each chunk once; the transcript grows with every chunk."""
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self.text = ""
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        self.text += self.decoder.decode(chunk)
+        return self.text.strip() or None
+
+    def finish(self) -> str:
+        self.text += self.decoder.decode(b"", final=True)
+        return self.text.strip()
+
+
+class TextSTT(STTBackend):
+    """Local stand-in: the "audio" is UTF-8 text. For tests and offline development."""
+
+    def transcribe(self, audio: bytes) -> str:
+        return audio.decode("utf-8", errors="ignore").strip()
+
+    def stream(self) -> STTStream:
+        return TextSTTStream()
+
+
+class TextTTS(TTSBackend):
+    """Local stand-in: returns the segment text as bytes. For tests and offline development."""
+
+    media_type = "text/plain"
+
+    def synthesize(self, text: str) -> bytes:
+        return text.encode("utf-8")
+
+
+STT_BACKENDS = {"google": GoogleSTT, "text": TextSTT}
+TTS_BACKENDS = {"gtts": GTTSBackend, "text": TextTTS}
+
+
+def get_stt_backend(name: str = None) -> STTBackend:
+    name = (name or os.getenv("VOICE_STT_BACKEND", "google")).lower()
+    if name not in STT_BACKENDS:
+        raise ValueError(f"Unknown STT backend: {name}")
+    return STT_BACKENDS[name]()
+
+
+def get_tts_backend(name: str = None) -> TTSBackend:
+    name = (name or os.getenv("VOICE_TTS_BACKEND", "gtts")).lower()
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name}")
+    return TTS_BACKENDS[name]()